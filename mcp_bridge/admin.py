@@ -2,6 +2,7 @@
 Django Admin configuration for MCP Bridge models
 """
 from django.contrib import admin
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from .models import (
     GitLabConnection,
     Repository,
@@ -14,9 +15,10 @@ from .models import (
 
 @admin.register(GitLabConnection)
 class GitLabConnectionAdmin(admin.ModelAdmin):
-    list_display = ['name', 'instance_url', 'is_active', 'has_token', 'created_at']
-    list_filter = ['is_active', 'created_at']
-    search_fields = ['name', 'instance_url']
+    list_display = ('name', 'instance_url', 'is_active', 'has_token', 'created_at')
+    list_filter = ('is_active', 'created_at')
+    search_fields = ('name', 'instance_url')
+    show_full_result_count = False
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'instance_url', 'is_active')
@@ -30,12 +32,28 @@ class GitLabConnectionAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
-    readonly_fields = ['created_at', 'updated_at']
-    
+    readonly_fields = ('created_at', 'updated_at')
+
+    def get_queryset(self, request):
+        # Compute token presence in SQL so the changelist doesn't Fernet-
+        # decrypt every row's access token just to render a boolean icon,
+        # and defer the encrypted columns entirely — the changelist never
+        # shows them, and the change form lazy-loads them on access
+        return super().get_queryset(request).defer(
+            'client_secret', 'access_token', 'refresh_token'
+        ).annotate(
+            _has_token_db=ExpressionWrapper(
+                Q(access_token__isnull=False), output_field=BooleanField()
+            )
+        )
+
     def has_token(self, obj):
         """Check if connection has an access token"""
         if not obj:
             return False
+        db_flag = getattr(obj, '_has_token_db', None)
+        if db_flag is not None:
+            return bool(db_flag)
         try:
             # Access the encrypted field - it will decrypt automatically
             # If decryption fails, it returns empty string, so bool() will be False
@@ -56,9 +74,11 @@ class GitLabConnectionAdmin(admin.ModelAdmin):
 
 @admin.register(Repository)
 class RepositoryAdmin(admin.ModelAdmin):
-    list_display = ['local_name', 'gitlab_project_path', 'gitlab_connection', 'force_ollama', 'is_active']
-    list_filter = ['is_active', 'gitlab_connection', 'created_at']
-    search_fields = ['local_name', 'gitlab_project_path']
+    list_display = ('local_name', 'gitlab_project_path', 'gitlab_connection', 'force_ollama', 'is_active')
+    list_select_related = ('gitlab_connection',)
+    list_filter = ('is_active', 'gitlab_connection', 'created_at')
+    search_fields = ('local_name', 'gitlab_project_path')
+    show_full_result_count = False
     fieldsets = (
         ('Mapping', {
             'fields': ('gitlab_connection', 'local_name', 'gitlab_project_id', 'gitlab_project_path', 'default_branch')
@@ -68,14 +88,14 @@ class RepositoryAdmin(admin.ModelAdmin):
             'description': 'Enable "Force Ollama" to ensure all AI analysis for this repository uses local models only.'
         }),
     )
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(LLMProvider)
 class LLMProviderAdmin(admin.ModelAdmin):
-    list_display = ['name', 'provider_type', 'base_url', 'is_active']
-    list_filter = ['provider_type', 'is_active', 'created_at']
-    search_fields = ['name', 'base_url']
+    list_display = ('name', 'provider_type', 'base_url', 'is_active')
+    list_filter = ('provider_type', 'is_active', 'created_at')
+    search_fields = ('name', 'base_url')
     fieldsets = (
         ('Provider Information', {
             'fields': ('name', 'provider_type', 'base_url', 'is_active')
@@ -85,14 +105,16 @@ class LLMProviderAdmin(admin.ModelAdmin):
             'description': 'API key is not required for Ollama (local) providers'
         }),
     )
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(AIModel)
 class AIModelAdmin(admin.ModelAdmin):
-    list_display = ['display_name', 'model_id', 'provider', 'is_default', 'is_active']
-    list_filter = ['is_active', 'is_default', 'provider', 'created_at']
-    search_fields = ['display_name', 'model_id']
+    list_display = ('display_name', 'model_id', 'provider', 'is_default', 'is_active')
+    list_select_related = ('provider',)
+    list_filter = ('is_active', 'is_default', 'provider', 'created_at')
+    search_fields = ('display_name', 'model_id')
+    show_full_result_count = False
     fieldsets = (
         ('Model Information', {
             'fields': ('provider', 'model_id', 'display_name')
@@ -101,14 +123,14 @@ class AIModelAdmin(admin.ModelAdmin):
             'fields': ('is_default', 'is_active')
         }),
     )
-    readonly_fields = ['created_at']  # Note: AIModel doesn't have updated_at
+    readonly_fields = ('created_at',)  # Note: AIModel doesn't have updated_at
 
 
 @admin.register(NotificationChannel)
 class NotificationChannelAdmin(admin.ModelAdmin):
-    list_display = ['name', 'channel_type', 'is_active', 'created_at']
-    list_filter = ['channel_type', 'is_active', 'created_at']
-    search_fields = ['name']
+    list_display = ('name', 'channel_type', 'is_active', 'created_at')
+    list_filter = ('channel_type', 'is_active', 'created_at')
+    search_fields = ('name',)
     fieldsets = (
         ('Channel Information', {
             'fields': ('name', 'channel_type', 'is_active')
@@ -117,17 +139,18 @@ class NotificationChannelAdmin(admin.ModelAdmin):
             'fields': ('webhook_url',)
         }),
     )
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(NotificationRule)
 class NotificationRuleAdmin(admin.ModelAdmin):
-    list_display = ['name', 'trigger_type', 'channel', 'is_active']
-    list_filter = ['trigger_type', 'is_active', 'channel', 'created_at']
-    search_fields = ['name']
+    list_display = ('name', 'trigger_type', 'channel', 'is_active')
+    list_select_related = ('channel',)
+    list_filter = ('trigger_type', 'is_active', 'channel', 'created_at')
+    search_fields = ('name',)
     fieldsets = (
         ('Rule Information', {
             'fields': ('name', 'trigger_type', 'channel', 'is_active')
         }),
     )
-    readonly_fields = ['created_at']  # Note: NotificationRule doesn't have updated_at
+    readonly_fields = ('created_at',)  # Note: NotificationRule doesn't have updated_at
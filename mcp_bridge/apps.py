@@ -1,6 +1,20 @@
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
 
 class McpBridgeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mcp_bridge'
+
+    def ready(self):
+        # Warm the cached Fernet at process start so the first request
+        # never pays the key-file read (or env lookup) on its own thread,
+        # and a broken key surfaces before traffic is served
+        from .models import _get_fernet
+        try:
+            _get_fernet()
+        except Exception as e:
+            logger.warning("Could not initialize encryption key at startup: %s", e)
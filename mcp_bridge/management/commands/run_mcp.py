@@ -1,9 +1,14 @@
 """
 Django management command to run the MCP server
 """
+import asyncio
+import io
 import json
+import os
 import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, Any
 from django.core.management.base import BaseCommand
 from django.core.exceptions import ObjectDoesNotExist
@@ -19,8 +24,233 @@ from mcp_bridge.services.log_analyzer import LogAnalyzer
 from mcp_bridge.services.ai_service import AIService
 from mcp_bridge.services.notification_service import NotificationService
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Configure logging once at import time rather than on every handle() call
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
 logger = logging.getLogger(__name__)
 
+# Tool descriptors are constant, so build the tools/list result once at
+# import time instead of re-allocating seven dicts with nested schemas on
+# every listing call.
+_TOOLS_LIST_RESULT = {
+    'tools': [
+        {
+            'name': 'list_gitlab_connections',
+            'description': 'List all configured GitLab connections',
+        },
+        {
+            'name': 'list_repositories',
+            'description': 'List all mapped repositories for a GitLab connection',
+            'inputSchema': {
+                'type': 'object',
+                'properties': {
+                    'connection_name': {'type': 'string'}
+                },
+                'required': ['connection_name']
+            }
+        },
+        {
+            'name': 'list_ai_models',
+            'description': 'List all available AI models',
+        },
+        {
+            'name': 'analyze_logs',
+            'description': 'Analyze a local log file and extract errors',
+            'inputSchema': {
+                'type': 'object',
+                'properties': {
+                    'file_path': {'type': 'string'},
+                },
+                'required': ['file_path']
+            }
+        },
+        {
+            'name': 'fetch_gitlab_file',
+            'description': 'Fetch file content from a GitLab repository',
+            'inputSchema': {
+                'type': 'object',
+                'properties': {
+                    'connection_name': {'type': 'string'},
+                    'repository_name': {'type': 'string'},
+                    'file_path': {'type': 'string'},
+                    'ref': {'type': 'string'}
+                },
+                'required': ['connection_name', 'repository_name', 'file_path']
+            }
+        },
+        {
+            'name': 'generate_fix',
+            'description': 'Generate a fix suggestion using AI based on log errors and GitLab code',
+            'inputSchema': {
+                'type': 'object',
+                'properties': {
+                    'log_file_path': {'type': 'string'},
+                    'connection_name': {'type': 'string'},
+                    'repository_name': {'type': 'string'},
+                    'model_name': {'type': 'string'}
+                },
+                'required': ['log_file_path', 'connection_name', 'repository_name']
+            }
+        },
+        {
+            'name': 'send_notification',
+            'description': 'Send a notification to configured channels',
+            'inputSchema': {
+                'type': 'object',
+                'properties': {
+                    'channel_name': {'type': 'string'},
+                    'title': {'type': 'string'},
+                    'message': {'type': 'string'}
+                },
+                'required': ['channel_name', 'title', 'message']
+            }
+        },
+    ]
+}
+
+
+# Sentinel distinguishing "unknown tool" from a tool returning None
+_TOOL_NOT_FOUND = object()
+
+# Bounds on the code context gathered for generate_fix: at most this
+# many distinct files are fetched, with a few snippets each, so the AI
+# prompt stays small however many references the log contains
+_MAX_CONTEXT_FILES = 5
+_MAX_SNIPPETS_PER_FILE = 3
+
+
+def _dispatch_tool(server, name, args):
+    """Dispatch a tools/call to the named tool with positional arguments
+
+    The tool set is small and fixed, so a match statement calling each
+    tool with arguments pulled straight from the params dict avoids the
+    per-call **kwargs expansion of a handler-table lookup and lets CPython
+    specialize each branch. A missing required argument raises KeyError,
+    which the caller reports as a tool execution error just like the
+    TypeError the kwargs path used to raise.
+    """
+    match name:
+        case 'list_gitlab_connections':
+            return server.list_gitlab_connections()
+        case 'list_repositories':
+            return server.list_repositories(args['connection_name'])
+        case 'list_ai_models':
+            return server.list_ai_models()
+        case 'analyze_logs':
+            return server.analyze_logs(args['file_path'])
+        case 'fetch_gitlab_file':
+            return server.fetch_gitlab_file(
+                args['connection_name'],
+                args['repository_name'],
+                args['file_path'],
+                args.get('ref'),
+            )
+        case 'generate_fix':
+            return server.generate_fix(
+                args['log_file_path'],
+                args['connection_name'],
+                args['repository_name'],
+                args.get('model_name'),
+            )
+        case 'send_notification':
+            return server.send_notification(
+                args['channel_name'], args['title'], args['message']
+            )
+        case _:
+            return _TOOL_NOT_FOUND
+
+
+@lru_cache(maxsize=16)
+def _analyze_log_file(file_path: str, mtime_ns: int, size: int):
+    """Run the LogAnalyzer pipeline once per (path, mtime, size)
+
+    generate_fix workflows commonly re-analyze the same log while retrying
+    with different models; keying on the file's mtime and size means repeat
+    calls reuse the extracted errors and the cache invalidates itself as
+    soon as the log changes.
+    """
+    analyzer = LogAnalyzer(file_path)
+    errors = analyzer.extract_errors()
+    summary = analyzer.get_summary()
+    file_refs = analyzer.get_file_references()
+    return analyzer, errors, summary, file_refs
+
+
+def _cached_analysis(file_path: str):
+    """Look up (or compute) the cached analysis for a log file"""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Log file not found: {file_path}")
+    st = os.stat(file_path)
+    return _analyze_log_file(file_path, st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=32)
+def _get_gitlab_service(connection_id: int, token_expiry_epoch: int) -> GitLabService:
+    """Get a cached GitLabService for a connection
+
+    Building a GitLabService per tool call re-decrypts tokens and hands the
+    python-gitlab client a cold HTTP session, so every call pays a TLS
+    handshake. Keying the cache on (connection id, token expiry) reuses the
+    service — and its keepalive connection pool — across RPC calls while
+    naturally busting the entry whenever the token is refreshed.
+    """
+    return GitLabService(GitLabConnection.objects.get(pk=connection_id))
+
+
+def _gitlab_service_for(connection: GitLabConnection) -> GitLabService:
+    """Resolve the cached GitLabService for an already-loaded connection"""
+    expiry = connection.token_expires_at
+    return _get_gitlab_service(
+        connection.pk, int(expiry.timestamp()) if expiry else 0
+    )
+
+
+if ORJSON_AVAILABLE:
+    def _json_loads(data):
+        """Decode a JSON-RPC message from raw bytes in a single pass"""
+        return orjson.loads(data)
+
+    def _json_dumps_bytes(obj) -> bytes:
+        """Encode a JSON-RPC response straight to bytes"""
+        return orjson.dumps(obj)
+
+    def _json_dumps_indented(obj) -> str:
+        """Pretty-print a tool result for the response content block"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+else:
+    def _json_loads(data):
+        """Decode a JSON-RPC message from raw bytes in a single pass"""
+        return json.loads(data)
+
+    def _json_dumps_bytes(obj) -> bytes:
+        """Encode a JSON-RPC response straight to bytes"""
+        return json.dumps(obj).encode()
+
+    def _json_dumps_indented(obj) -> str:
+        """Pretty-print a tool result for the response content block"""
+        return json.dumps(obj, indent=2)
+
+
+# Tool results are parsed by MCP clients, not read by humans, so serialize
+# them compactly by default: indenting adds ~30% to the payload and the
+# result gets JSON-encoded a second time inside the response envelope.
+# Set MCP_PRETTY_JSON=1 to restore indented output for manual debugging.
+if os.environ.get('MCP_PRETTY_JSON', '').lower() in ('1', 'true', 'yes'):
+    _json_dumps_text = _json_dumps_indented
+else:
+    def _json_dumps_text(obj) -> str:
+        """Serialize a tool result compactly for the response content block"""
+        return _json_dumps_bytes(obj).decode()
+
 
 class Command(BaseCommand):
     help = 'Run the MCP server for GitLab integration'
@@ -29,12 +259,6 @@ class Command(BaseCommand):
         """Run the MCP server over stdio"""
         self.stdout.write("Starting GitLab MCP Bridge Server...", ending='\n')
         
-        # Set up logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
         # Initialize MCP server
         server = MCPServer()
         server.run()
@@ -42,176 +266,190 @@ class Command(BaseCommand):
 
 class MCPServer:
     """MCP Server implementation using JSON-RPC over stdio"""
-    
+
+    # Number of worker threads handling tools/call dispatch concurrently
+    WORKER_COUNT = 8
+    # Bound on queued requests so a fast client can't buffer unbounded work
+    QUEUE_SIZE = 64
+
     def __init__(self):
-        self.tools = {
-            'list_gitlab_connections': self.list_gitlab_connections,
-            'list_repositories': self.list_repositories,
-            'list_ai_models': self.list_ai_models,
-            'analyze_logs': self.analyze_logs,
-            'fetch_gitlab_file': self.fetch_gitlab_file,
-            'generate_fix': self.generate_fix,
-            'send_notification': self.send_notification,
+        self._methods = {
+            'initialize': self._initialize,
+            'tools/list': self._tools_list,
+            'tools/call': self._tools_call,
         }
-    
+
     def run(self):
         """Main server loop - reads from stdin, writes to stdout"""
         try:
-            while True:
-                line = sys.stdin.readline()
-                if not line:
-                    break
-                
-                line = line.strip()
-                if not line:
-                    continue
-                
-                try:
-                    request = json.loads(line)
-                    response = self.handle_request(request)
-                    if response:
-                        print(json.dumps(response), flush=True)
-                except json.JSONDecodeError as e:
-                    error_response = self.create_error_response(
-                        None, -32700, "Parse error", str(e)
-                    )
-                    print(json.dumps(error_response), flush=True)
-                except Exception as e:
-                    logger.error(f"Error handling request: {e}", exc_info=True)
-                    error_response = self.create_error_response(
-                        None, -32603, "Internal error", str(e)
-                    )
-                    print(json.dumps(error_response), flush=True)
+            asyncio.run(self._run_async())
         except KeyboardInterrupt:
             logger.info("Server shutting down...")
         except Exception as e:
-            logger.error(f"Fatal error: {e}", exc_info=True)
+            logger.error("Fatal error: %s", e, exc_info=True)
+
+    async def _run_async(self):
+        """Async server loop using buffered stdin/stdout
+
+        stdin is drained through an asyncio.StreamReader so reads come from
+        a kernel-sized buffer instead of one syscall per line, and responses
+        go through a single BufferedWriter around sys.stdout.buffer so writes
+        are coalesced before each flush.
+
+        Parsed requests are pushed onto a bounded queue feeding a fixed pool
+        of worker coroutines, each dispatching handle_request in a thread
+        executor. A slow tool call (LLM + GitLab HTTP) no longer blocks the
+        other requests on the same stdio session; responses carry their
+        request id, so JSON-RPC ordering is not required.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+        )
+        out = io.BufferedWriter(sys.stdout.buffer, buffer_size=65536)
+        write_lock = asyncio.Lock()
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+
+        with ThreadPoolExecutor(max_workers=self.WORKER_COUNT) as pool:
+            workers = [
+                asyncio.ensure_future(
+                    self._worker(loop, pool, queue, out, write_lock)
+                )
+                for _ in range(self.WORKER_COUNT)
+            ]
+
+            # Persistent line buffer: reads land in one reusable bytearray and
+            # each message is sliced out at the newline, instead of readline()
+            # allocating a fresh str plus a stripped copy per message.
+            linebuf = bytearray()
+
+            try:
+                while True:
+                    nl = linebuf.find(b'\n')
+                    if nl < 0:
+                        chunk = await reader.read(65536)
+                        if not chunk:
+                            break
+                        linebuf.extend(chunk)
+                        continue
+
+                    line = linebuf[:nl]
+                    del linebuf[:nl + 1]
+
+                    # Per JSON-RPC framing only the line terminator needs
+                    # trimming; tolerate \r\n clients.
+                    if line.endswith(b'\r'):
+                        del line[-1:]
+                    if not line:
+                        continue
+
+                    try:
+                        request = _json_loads(line)
+                    except ValueError as e:
+                        error_response = self.create_error_response(
+                            None, -32700, "Parse error", str(e)
+                        )
+                        await self._write_response(out, write_lock, error_response)
+                        continue
+
+                    await queue.put(request)
+
+                # Drain in-flight requests before shutting the workers down
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+
+    async def _worker(self, loop, pool, queue, out, write_lock):
+        """Pull requests off the queue and dispatch them in the thread pool"""
+        while True:
+            request = await queue.get()
+            try:
+                response = await loop.run_in_executor(
+                    pool, self.handle_request, request
+                )
+                if response:
+                    await self._write_response(out, write_lock, response)
+            except Exception as e:
+                logger.error("Error handling request: %s", e, exc_info=True)
+                # A parse-valid but non-object message (e.g. a bare array)
+                # lands here too; it has no id to echo back
+                request_id = request.get('id') if isinstance(request, dict) else None
+                error_response = self.create_error_response(
+                    request_id, -32603, "Internal error", str(e)
+                )
+                await self._write_response(out, write_lock, error_response)
+            finally:
+                queue.task_done()
+
+    async def _write_response(self, out, write_lock, response):
+        """Write a JSON-RPC response followed by a newline and flush
+
+        Writes are serialized through a lock so concurrent workers can't
+        interleave partial lines and break JSON-RPC framing.
+        """
+        async with write_lock:
+            out.write(_json_dumps_bytes(response) + b'\n')
+            out.flush()
     
     def handle_request(self, request):
         """Handle a JSON-RPC request"""
         method = request.get('method')
         params = request.get('params', {})
         request_id = request.get('id')
-        
-        if method == 'initialize':
-            return self.create_success_response(request_id, {
-                'protocolVersion': '2024-11-05',
-                'capabilities': {
-                    'tools': {}
-                },
-                'serverInfo': {
-                    'name': 'gitlab-mcp-bridge',
-                    'version': '0.1.0'
-                }
-            })
-        
-        elif method == 'tools/list':
-            return self.create_success_response(request_id, {
-                'tools': [
-                    {
-                        'name': 'list_gitlab_connections',
-                        'description': 'List all configured GitLab connections',
-                    },
-                    {
-                        'name': 'list_repositories',
-                        'description': 'List all mapped repositories for a GitLab connection',
-                        'inputSchema': {
-                            'type': 'object',
-                            'properties': {
-                                'connection_name': {'type': 'string'}
-                            },
-                            'required': ['connection_name']
-                        }
-                    },
-                    {
-                        'name': 'list_ai_models',
-                        'description': 'List all available AI models',
-                    },
-                    {
-                        'name': 'analyze_logs',
-                        'description': 'Analyze a local log file and extract errors',
-                        'inputSchema': {
-                            'type': 'object',
-                            'properties': {
-                                'file_path': {'type': 'string'},
-                            },
-                            'required': ['file_path']
-                        }
-                    },
-                    {
-                        'name': 'fetch_gitlab_file',
-                        'description': 'Fetch file content from a GitLab repository',
-                        'inputSchema': {
-                            'type': 'object',
-                            'properties': {
-                                'connection_name': {'type': 'string'},
-                                'repository_name': {'type': 'string'},
-                                'file_path': {'type': 'string'},
-                                'ref': {'type': 'string'}
-                            },
-                            'required': ['connection_name', 'repository_name', 'file_path']
-                        }
-                    },
-                    {
-                        'name': 'generate_fix',
-                        'description': 'Generate a fix suggestion using AI based on log errors and GitLab code',
-                        'inputSchema': {
-                            'type': 'object',
-                            'properties': {
-                                'log_file_path': {'type': 'string'},
-                                'connection_name': {'type': 'string'},
-                                'repository_name': {'type': 'string'},
-                                'model_name': {'type': 'string'}
-                            },
-                            'required': ['log_file_path', 'connection_name', 'repository_name']
-                        }
-                    },
-                    {
-                        'name': 'send_notification',
-                        'description': 'Send a notification to configured channels',
-                        'inputSchema': {
-                            'type': 'object',
-                            'properties': {
-                                'channel_name': {'type': 'string'},
-                                'title': {'type': 'string'},
-                                'message': {'type': 'string'}
-                            },
-                            'required': ['channel_name', 'title', 'message']
-                        }
-                    },
-                ]
-            })
-        
-        elif method == 'tools/call':
-            tool_name = params.get('name')
-            tool_args = params.get('arguments', {})
-            
-            if tool_name in self.tools:
-                try:
-                    result = self.tools[tool_name](**tool_args)
-                    return self.create_success_response(request_id, {
-                        'content': [
-                            {
-                                'type': 'text',
-                                'text': json.dumps(result, indent=2)
-                            }
-                        ]
-                    })
-                except Exception as e:
-                    logger.error(f"Error executing tool {tool_name}: {e}", exc_info=True)
-                    return self.create_error_response(
-                        request_id, -32603, "Tool execution error", str(e)
-                    )
-            else:
-                return self.create_error_response(
-                    request_id, -32601, "Method not found", f"Unknown tool: {tool_name}"
-                )
-        
-        else:
+
+        handler = self._methods.get(method)
+        if handler is None:
             return self.create_error_response(
                 request_id, -32601, "Method not found", f"Unknown method: {method}"
             )
-    
+        return handler(request_id, params)
+
+    def _initialize(self, request_id, params):
+        """Handle the initialize handshake"""
+        return self.create_success_response(request_id, {
+            'protocolVersion': '2024-11-05',
+            'capabilities': {
+                'tools': {}
+            },
+            'serverInfo': {
+                'name': 'gitlab-mcp-bridge',
+                'version': '0.1.0'
+            }
+        })
+
+    def _tools_list(self, request_id, params):
+        """Handle tools/list"""
+        return self.create_success_response(request_id, _TOOLS_LIST_RESULT)
+
+    def _tools_call(self, request_id, params):
+        """Handle tools/call by dispatching to the named tool"""
+        tool_name = params.get('name')
+        tool_args = params.get('arguments', {})
+
+        try:
+            result = _dispatch_tool(self, tool_name, tool_args)
+        except Exception as e:
+            logger.error("Error executing tool %s: %s", tool_name, e, exc_info=True)
+            return self.create_error_response(
+                request_id, -32603, "Tool execution error", str(e)
+            )
+
+        if result is _TOOL_NOT_FOUND:
+            return self.create_error_response(
+                request_id, -32601, "Method not found", f"Unknown tool: {tool_name}"
+            )
+
+        return self.create_success_response(request_id, {
+            'content': [
+                {
+                    'type': 'text',
+                    'text': _json_dumps_text(result)
+                }
+            ]
+        })
+
     def create_success_response(self, request_id, result):
         """Create a successful JSON-RPC response"""
         return {
@@ -237,61 +475,55 @@ class MCPServer:
     # Tool implementations
     def list_gitlab_connections(self):
         """List all GitLab connections"""
-        connections = GitLabConnection.objects.filter(is_active=True)
-        return {
-            'connections': [
-                {
-                    'name': conn.name,
-                    'instance_url': conn.instance_url,
-                    'has_token': bool(conn.access_token),
-                }
-                for conn in connections
-            ]
-        }
-    
+        from django.db.models import BooleanField, ExpressionWrapper, Q
+        # .values() reads only the serialized columns straight off the
+        # cursor, and has_token is computed in SQL so the encrypted token
+        # is never loaded or Fernet-decrypted just to report a boolean.
+        connections = GitLabConnection.objects.filter(is_active=True).annotate(
+            has_token=ExpressionWrapper(
+                Q(access_token__isnull=False), output_field=BooleanField()
+            )
+        ).values('name', 'instance_url', 'has_token')
+        return {'connections': list(connections)}
+
     def list_repositories(self, connection_name: str):
         """List repositories for a connection"""
         try:
             connection = GitLabConnection.objects.get(name=connection_name, is_active=True)
-            repos = Repository.objects.filter(gitlab_connection=connection, is_active=True)
+            repos = Repository.objects.filter(
+                gitlab_connection=connection, is_active=True
+            ).values('local_name', 'gitlab_project_path', 'default_branch')
             return {
                 'connection': connection_name,
-                'repositories': [
-                    {
-                        'local_name': repo.local_name,
-                        'gitlab_project_path': repo.gitlab_project_path,
-                        'default_branch': repo.default_branch,
-                    }
-                    for repo in repos
-                ]
+                'repositories': list(repos),
             }
         except ObjectDoesNotExist:
             return {'error': f'Connection "{connection_name}" not found'}
-    
+
     def list_ai_models(self):
         """List all available AI models"""
-        models = AIModel.objects.filter(is_active=True).select_related('provider')
+        rows = AIModel.objects.filter(is_active=True).values(
+            'display_name', 'model_id', 'is_default',
+            'provider__name', 'provider__provider_type',
+        )
         return {
             'models': [
                 {
-                    'display_name': model.display_name,
-                    'model_id': model.model_id,
-                    'provider': model.provider.name,
-                    'provider_type': model.provider.provider_type,
-                    'is_default': model.is_default,
+                    'display_name': row['display_name'],
+                    'model_id': row['model_id'],
+                    'provider': row['provider__name'],
+                    'provider_type': row['provider__provider_type'],
+                    'is_default': row['is_default'],
                 }
-                for model in models
+                for row in rows
             ]
         }
     
     def analyze_logs(self, file_path: str):
         """Analyze a log file and extract errors"""
         try:
-            analyzer = LogAnalyzer(file_path)
-            errors = analyzer.extract_errors()
-            summary = analyzer.get_summary()
-            file_refs = analyzer.get_file_references()
-            
+            analyzer, errors, summary, file_refs = _cached_analysis(file_path)
+
             return {
                 'summary': summary,
                 'errors': errors,
@@ -319,7 +551,7 @@ class MCPServer:
                 is_active=True
             )
             
-            service = GitLabService(connection)
+            service = _gitlab_service_for(connection)
             if ref:
                 content = service.get_file_content(repository, file_path, ref)
             else:
@@ -343,11 +575,9 @@ class MCPServer:
     ):
         """Generate a fix suggestion using AI"""
         try:
-            # Analyze logs
-            analyzer = LogAnalyzer(log_file_path)
-            errors = analyzer.extract_errors()
-            file_refs = analyzer.get_file_references()
-            
+            # Analyze logs (cached until the file changes on disk)
+            analyzer, errors, _, file_refs = _cached_analysis(log_file_path)
+
             if not errors:
                 return {'message': 'No errors found in log file'}
             
@@ -359,39 +589,26 @@ class MCPServer:
                 is_active=True
             )
             
-            # Get AI model (respect privacy mode)
+            # Get AI model (respect privacy mode) with a single indexed query
             from django.db.models import Q
+            filters = Q(is_active=True)
             if repository.force_ollama:
                 # Privacy mode: only use Ollama models
-                if model_name:
-                    model = AIModel.objects.filter(
-                        (Q(display_name=model_name) | Q(model_id=model_name)),
-                        provider__provider_type='ollama',
-                        is_active=True
-                    ).first()
-                else:
-                    # Get default Ollama model
-                    model = AIModel.objects.filter(
-                        provider__provider_type='ollama',
-                        is_active=True
-                    ).first()
-                
-                if not model:
+                filters &= Q(provider__provider_type='ollama')
+            elif not model_name:
+                # Normal mode without an explicit model: use the default
+                filters &= Q(is_default=True)
+            if model_name:
+                filters &= Q(display_name=model_name) | Q(model_id=model_name)
+
+            model = AIModel.objects.select_related('provider').filter(filters).first()
+
+            if not model:
+                if repository.force_ollama:
                     return {'error': 'Privacy mode enabled for this repository. Please configure an Ollama model in Django Admin.'}
-            else:
-                # Normal mode: use any model
-                if model_name:
-                    model = AIModel.objects.filter(
-                        (Q(display_name=model_name) | Q(model_id=model_name)),
-                        is_active=True
-                    ).first()
-                else:
-                    model = AIService.get_default_model()
-                
-                if not model:
-                    return {'error': 'No AI model available. Please configure one in Django Admin.'}
+                return {'error': 'No AI model available. Please configure one in Django Admin.'}
             
-            gitlab_service = GitLabService(connection)
+            gitlab_service = _gitlab_service_for(connection)
             ai_service = AIService(model)
             
             # Process first error with file reference (optimized for speed)
@@ -399,28 +616,52 @@ class MCPServer:
             # Use only the error line, not full context (faster)
             error_context = first_error.get('raw_line', '')[:500]  # Limit to 500 chars
             
+            # Group file references by file so each distinct file costs one
+            # GitLab round-trip; line ranges are sliced locally. Stack traces
+            # commonly reference the same file many times, so this turns
+            # O(errors) HTTP calls into O(distinct files). Both dimensions
+            # are capped so a log referencing dozens of files can't balloon
+            # the fetch fan-out or the AI prompt.
+            by_file = {}
+            for ref_path, ref_line in file_refs:
+                # Validate file path - skip if it looks invalid (e.g., just a number)
+                if not ref_path or ref_path.isdigit() or len(ref_path) < 3:
+                    logger.warning("Skipping invalid file path: %s", ref_path)
+                    continue
+                if not ref_line:
+                    continue
+                line_nums = by_file.get(ref_path)
+                if line_nums is None:
+                    if len(by_file) >= _MAX_CONTEXT_FILES:
+                        continue
+                    line_nums = by_file[ref_path] = []
+                if len(line_nums) < _MAX_SNIPPETS_PER_FILE:
+                    line_nums.append(ref_line)
+
             code_context = None
-            if 'file_path' in first_error and first_error.get('line_number'):
-                try:
-                    file_path = first_error['file_path']
-                    line_num = first_error['line_number']
-                    
-                    # Validate file path - skip if it looks invalid (e.g., just a number)
-                    if not file_path or file_path.isdigit() or len(file_path) < 3:
-                        logger.warning(f"Skipping invalid file path: {file_path}")
-                    else:
-                        # Fetch fewer surrounding lines for faster processing (5 before, 5 after)
-                        code_context = gitlab_service.get_file_lines(
-                            repository, file_path, max(1, line_num - 5), line_num + 5
-                        )
-                        code_context = f"File: {file_path}\nLines {code_context['lines'][0]}-{code_context['lines'][-1]}:\n{code_context['content']}"
-                except Exception as e:
-                    logger.warning(f"Could not fetch code context: {e}")
+            context_parts = []
+            # Fetch all referenced files in parallel; failures are logged
+            # by the service and simply drop out of the mapping
+            fetched = gitlab_service.get_files_content(repository, by_file.keys())
+            for ref_path, line_nums in by_file.items():
+                full_content = fetched.get(ref_path)
+                if full_content is None:
+                    continue
+                file_lines = full_content['content'].split('\n')
+                for line_num in line_nums:
+                    # Fetch fewer surrounding lines for faster processing (5 before, 5 after)
+                    start = max(1, line_num - 5)
+                    end = min(len(file_lines), line_num + 5)
+                    snippet = '\n'.join(file_lines[start - 1:end])
+                    context_parts.append(f"File: {ref_path}\nLines {start}-{end}:\n{snippet}")
+            if context_parts:
+                code_context = '\n\n'.join(context_parts)
             
             # Generate fix with reduced context for faster response
             try:
-                # Limit log content to 500 chars for faster processing
-                log_snippet = analyzer.content[:500] if analyzer.content else None
+                # Limit log content to 500 chars for faster processing;
+                # head() reads just the prefix instead of the whole file
+                log_snippet = analyzer.head(500) or None
                 fix_result = ai_service.generate_fix_suggestion(
                     error_context=error_context,
                     code_context=code_context,
@@ -429,7 +670,7 @@ class MCPServer:
             except (ValueError, Exception) as e:
                 # Handle provider-specific errors (like Gemini model not found)
                 error_msg = str(e)
-                logger.warning(f"AI service error: {error_msg}")
+                logger.warning("AI service error: %s", error_msg)
                 
                 # Try to fallback to Ollama if available
                 if "Gemini" in error_msg or "not found" in error_msg or "404" in error_msg:
@@ -438,16 +679,16 @@ class MCPServer:
                         is_active=True
                     ).first()
                     if ollama_model:
-                        logger.info(f"Falling back to Ollama model: {ollama_model.display_name}")
+                        logger.info("Falling back to Ollama model: %s", ollama_model.display_name)
                         try:
                             ai_service = AIService(ollama_model)
                             fix_result = ai_service.generate_fix_suggestion(
                                 error_context=error_context,
                                 code_context=code_context,
-                                log_content=analyzer.content[:2000] if analyzer.content else None
+                                log_content=analyzer.head(2000) or None
                             )
                         except Exception as ollama_error:
-                            logger.error(f"Ollama fallback also failed: {ollama_error}")
+                            logger.error("Ollama fallback also failed: %s", ollama_error)
                             return {'error': f"Both primary AI service and Ollama fallback failed. Original error: {error_msg}"}
                     else:
                         # Try any other available model
@@ -455,16 +696,16 @@ class MCPServer:
                             provider__provider_type='gemini'
                         ).filter(is_active=True).first()
                         if other_model:
-                            logger.info(f"Falling back to {other_model.provider.name} model: {other_model.display_name}")
+                            logger.info("Falling back to %s model: %s", other_model.provider.name, other_model.display_name)
                             try:
                                 ai_service = AIService(other_model)
                                 fix_result = ai_service.generate_fix_suggestion(
                                     error_context=error_context,
                                     code_context=code_context,
-                                    log_content=analyzer.content[:2000] if analyzer.content else None
+                                    log_content=analyzer.head(2000) or None
                                 )
                             except Exception as other_error:
-                                logger.error(f"Fallback model also failed: {other_error}")
+                                logger.error("Fallback model also failed: %s", other_error)
                                 return {'error': f"AI service failed: {error_msg}"}
                         else:
                             return {'error': f"{error_msg}. No alternative AI models available."}
@@ -487,7 +728,7 @@ class MCPServer:
             }
             
         except Exception as e:
-            logger.error(f"Error generating fix: {e}", exc_info=True)
+            logger.error("Error generating fix: %s", e, exc_info=True)
             return {'error': str(e)}
     
     def send_notification(self, channel_name: str, title: str, message: str):
@@ -527,6 +768,6 @@ class MCPServer:
                 'message': 'Notification sent to Teams' if success else 'Failed to send notification'
             }
         except Exception as e:
-            logger.error(f"Error sending to Teams: {e}")
+            logger.error("Error sending to Teams: %s", e)
             return {'error': str(e)}
 
@@ -66,24 +66,37 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS(f"✓ Connected successfully!"))
                 self.stdout.write(f"  - Authenticated as: {user.username if hasattr(user, 'username') else 'User'}")
                 
-                # Try to list repositories
+                # Try to list repositories (streamed page by page)
                 self.stdout.write(f"\n📦 Testing Repository Access...")
-                repos = service.list_repositories()
-                self.stdout.write(self.style.SUCCESS(f"✓ Found {len(repos)} repositories"))
-                
-                if repos:
+                first_repos = []
+                repo_count = 0
+                for repo in service.list_repositories():
+                    repo_count += 1
+                    if repo_count <= 5:  # Show first 5
+                        first_repos.append(repo)
+                self.stdout.write(self.style.SUCCESS(f"✓ Found {repo_count} repositories"))
+
+                if first_repos:
                     self.stdout.write(f"\n  Repositories:")
-                    for repo in repos[:5]:  # Show first 5
+                    for repo in first_repos:
                         self.stdout.write(f"    - {repo['path']} (ID: {repo['id']})")
-                    if len(repos) > 5:
-                        self.stdout.write(f"    ... and {len(repos) - 5} more")
+                    if repo_count > 5:
+                        self.stdout.write(f"    ... and {repo_count - 5} more")
                 
                 # Check synced repositories
-                synced_repos = Repository.objects.filter(gitlab_connection=connection, is_active=True)
-                self.stdout.write(f"\n💾 Synced Repositories in Database: {synced_repos.count()}")
-                if synced_repos.exists():
-                    for repo in synced_repos[:5]:
-                        self.stdout.write(f"    - {repo.local_name} -> {repo.gitlab_project_path}")
+                # Fetch one row more than we display so a single query
+                # covers the count(), exists() and slice this used to issue
+                synced_repos = list(
+                    Repository.objects.filter(
+                        gitlab_connection=connection, is_active=True
+                    ).only('local_name', 'gitlab_project_path')[:6]
+                )
+                count_label = str(len(synced_repos)) if len(synced_repos) <= 5 else '5+'
+                self.stdout.write(f"\n💾 Synced Repositories in Database: {count_label}")
+                for repo in synced_repos[:5]:
+                    self.stdout.write(f"    - {repo.local_name} -> {repo.gitlab_project_path}")
+                if len(synced_repos) > 5:
+                    self.stdout.write("    ... and more")
                 
             except gitlab.exceptions.GitlabAuthenticationError as e:
                 self.stdout.write(self.style.ERROR(f"\n❌ Authentication failed: {e}"))
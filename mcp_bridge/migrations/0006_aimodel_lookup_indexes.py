@@ -0,0 +1,28 @@
+# Generated by Django 5.2.17 on 2026-08-30 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mcp_bridge', '0005_alter_llmprovider_provider_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aimodel',
+            name='display_name',
+            field=models.CharField(db_index=True, help_text='Human-readable model name', max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='aimodel',
+            name='model_id',
+            field=models.CharField(db_index=True, help_text='Model identifier (e.g., gpt-4o, claude-3-5-sonnet, qwen2.5-coder:7b)', max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='llmprovider',
+            name='base_url',
+            field=models.URLField(help_text='API Base URL (e.g., https://api.openai.com/v1, https://api.cursor.com/v1 for Cursor, https://generativelanguage.googleapis.com for Gemini, or http://localhost:11434 for Ollama). Defaults will be set automatically if left blank.'),
+        ),
+    ]
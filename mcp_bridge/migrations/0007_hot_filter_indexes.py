@@ -0,0 +1,41 @@
+# Generated by Django 5.2.17 on 2026-08-30 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mcp_bridge', '0006_aimodel_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aimodel',
+            index=models.Index(fields=['provider', 'is_active', 'is_default'], name='aimodel_prov_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aimodel',
+            index=models.Index(condition=models.Q(('is_default', True)), fields=['is_default'], name='aimodel_default_partial'),
+        ),
+        migrations.AddIndex(
+            model_name='gitlabconnection',
+            index=models.Index(fields=['is_active'], name='glconn_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='llmprovider',
+            index=models.Index(fields=['is_active'], name='llmprov_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationrule',
+            index=models.Index(fields=['trigger_type', 'is_active'], name='rule_trigger_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationrule',
+            index=models.Index(fields=['channel', 'is_active'], name='rule_chan_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repository',
+            index=models.Index(fields=['gitlab_connection', 'is_active'], name='repo_conn_active_idx'),
+        ),
+    ]
@@ -2,13 +2,19 @@
 Django models for GitLab MCP Bridge
 """
 from django.db import models
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from django.conf import settings
 import base64
+import functools
+import logging
 import os
 
+logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=1)
 def get_encryption_key():
     """Get or generate encryption key for sensitive data
     
@@ -33,9 +39,7 @@ def get_encryption_key():
             return env_key
         except Exception as e:
             # If encoding fails, log and fall through to file-based key
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to process ENCRYPTION_KEY from environment: {e}. Falling back to file-based key.")
+            logger.warning("Failed to process ENCRYPTION_KEY from environment: %s. Falling back to file-based key.", e)
     
     # Fallback to file-based key (for local development)
     key_file = os.path.join(settings.BASE_DIR, '.encryption_key')
@@ -50,12 +54,34 @@ def get_encryption_key():
         return key
 
 
+@functools.lru_cache(maxsize=1)
+def _get_fernet():
+    """Get the shared Fernet (or MultiFernet) instance
+
+    Building a Fernet per encrypt/decrypt call re-resolves the key (env
+    lookup or file read) and re-runs the key schedule; every row loaded
+    through EncryptedTextField pays that. Caching a single instance turns
+    it into a pointer load.
+
+    If ENCRYPTION_KEY_FALLBACKS is set (comma-separated base64 Fernet
+    keys), a MultiFernet is returned so values encrypted under a previous
+    key keep decrypting during key rotation. New values are always
+    encrypted with the primary key; each token still gets a single HMAC
+    verify pass per candidate key.
+    """
+    fernets = [Fernet(get_encryption_key())]
+    for raw_key in os.environ.get('ENCRYPTION_KEY_FALLBACKS', '').split(','):
+        raw_key = raw_key.strip()
+        if raw_key:
+            fernets.append(Fernet(raw_key.encode()))
+    return MultiFernet(fernets) if len(fernets) > 1 else fernets[0]
+
+
 def encrypt_value(value: str) -> bytes:
     """Encrypt a string value"""
     if not value:
         return b''
-    f = Fernet(get_encryption_key())
-    return f.encrypt(value.encode())
+    return _get_fernet().encrypt(value.encode())
 
 
 def decrypt_value(encrypted) -> str:
@@ -77,53 +103,68 @@ def decrypt_value(encrypted) -> str:
     if isinstance(encrypted, str):
         try:
             # Try to decode as base64 first
-            import base64
             encrypted = base64.b64decode(encrypted)
         except Exception:
             # If it's not base64, it might be plain text (unencrypted data)
             # Return as-is to avoid breaking existing data
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.debug(f"Value appears to be plain text, not encrypted: {type(encrypted)}")
+            logger.debug("Value appears to be plain text, not encrypted: %s", type(encrypted))
             return encrypted
     
     # Ensure we have bytes
     if not isinstance(encrypted, bytes):
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.warning(f"Failed to decrypt value: expected bytes, got {type(encrypted)}. Returning empty string.")
+        logger.warning("Failed to decrypt value: expected bytes, got %s. Returning empty string.", type(encrypted))
         return ''
     
     try:
-        f = Fernet(get_encryption_key())
-        return f.decrypt(encrypted).decode()
+        return _get_fernet().decrypt(encrypted).decode()
     except Exception as e:
         # If decryption fails (wrong key, corrupted data, etc.), return empty string
         # This prevents crashes when viewing admin pages
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.warning(f"Failed to decrypt value: {e}. Returning empty string.")
+        logger.warning("Failed to decrypt value: %s. Returning empty string.", e)
         return ''
 
 
 class EncryptedTextField(models.BinaryField):
     """Custom field that encrypts/decrypts text automatically"""
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, is_secret=None, **kwargs):
         # Ensure the field is editable in admin
         kwargs.setdefault('editable', True)
         super().__init__(*args, **kwargs)
-    
+        # None means "auto-detect from the field name" once the field is
+        # attached; an explicit True/False overrides the name heuristic
+        self._is_sensitive = is_secret
+        self._is_secret_explicit = is_secret is not None
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        # Only serialize the kwarg when it was passed explicitly, so the
+        # auto-detected value doesn't leak into existing migrations
+        if self._is_secret_explicit:
+            kwargs['is_secret'] = self._is_sensitive
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        # The widget choice depends only on the field name, so classify
+        # once when the model class is built instead of re-running the
+        # substring checks on every form construction
+        if self._is_sensitive is None:
+            lowered = name.lower()
+            self._is_sensitive = 'secret' in lowered or 'token' in lowered
+
     def from_db_value(self, value, expression, connection):
         if value is None:
             return value
+        if not value:
+            # Empty bytes mean "never set"; skip the decrypt call (and its
+            # try/except machinery) for the common unset-token case
+            return ''
         try:
             return decrypt_value(value)
         except Exception:
             # If decryption fails, return empty string to prevent crashes
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to decrypt field value. Returning empty string.")
+            logger.warning("Failed to decrypt field value. Returning empty string.")
             return ''
     
     def to_python(self, value):
@@ -131,13 +172,14 @@ class EncryptedTextField(models.BinaryField):
             return value
         if value is None:
             return value
+        if not value:
+            # Same empty-bytes fast path as from_db_value
+            return ''
         try:
             return decrypt_value(value)
         except Exception:
             # If decryption fails, return empty string to prevent crashes
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to decrypt field value in to_python. Returning empty string.")
+            logger.warning("Failed to decrypt field value in to_python. Returning empty string.")
             return ''
     
     def get_prep_value(self, value):
@@ -174,9 +216,7 @@ class EncryptedTextField(models.BinaryField):
                         setattr(model_instance, self.attname, row[0])
                         return row[0]
             except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Could not preserve existing value for {self.attname}: {e}")
+                logger.warning("Could not preserve existing value for %s: %s", self.attname, e)
         
         # If value is a string (from form), encrypt it
         if isinstance(value, str) and value:
@@ -191,9 +231,8 @@ class EncryptedTextField(models.BinaryField):
         # Use CharField for the form instead of BinaryField
         # This allows the field to be editable in Django admin
         from django import forms
-        field_name = getattr(self, 'name', '')
         defaults = {
-            'widget': forms.PasswordInput(render_value=True) if 'secret' in field_name.lower() or 'token' in field_name.lower() else forms.TextInput,
+            'widget': forms.PasswordInput(render_value=True) if getattr(self, '_is_sensitive', False) else forms.TextInput,
             'required': not self.null and not self.blank,
         }
         defaults.update(kwargs)
@@ -217,10 +256,30 @@ class GitLabConnection(models.Model):
         verbose_name = "GitLab Connection"
         verbose_name_plural = "GitLab Connections"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['is_active'], name='glconn_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.instance_url})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Views cache the non-secret fields under this key; drop the
+        # entry so edits (admin or token refresh) are visible immediately
+        cache.delete(f'gitlab:conn:{self.pk}')
+
+    def delete(self, *args, **kwargs):
+        cache.delete(f'gitlab:conn:{self.pk}')
+        return super().delete(*args, **kwargs)
+
+
+class RepositoryManager(models.Manager):
+    """Manager that always joins the connection rendered on changelists"""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('gitlab_connection')
+
 
 class Repository(models.Model):
     """Maps local project identifiers to GitLab repositories"""
@@ -246,12 +305,17 @@ class Repository(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    objects = RepositoryManager()
+
     class Meta:
         verbose_name = "Repository"
         verbose_name_plural = "Repositories"
         unique_together = [['gitlab_connection', 'local_name']]
         ordering = ['local_name']
+        indexes = [
+            models.Index(fields=['gitlab_connection', 'is_active'], name='repo_conn_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.local_name} -> {self.gitlab_project_path}"
@@ -285,6 +349,9 @@ class LLMProvider(models.Model):
         verbose_name = "LLM Provider"
         verbose_name_plural = "LLM Providers"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['is_active'], name='llmprov_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.get_provider_type_display()})"
@@ -299,6 +366,13 @@ class LLMProvider(models.Model):
             self.base_url = 'https://api.openai.com/v1'
 
 
+class AIModelManager(models.Manager):
+    """Manager that always joins the provider dereferenced by __str__"""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('provider')
+
+
 class AIModel(models.Model):
     """Stores AI model configurations"""
     provider = models.ForeignKey(
@@ -308,30 +382,58 @@ class AIModel(models.Model):
     )
     model_id = models.CharField(
         max_length=200,
+        db_index=True,
         help_text="Model identifier (e.g., gpt-4o, claude-3-5-sonnet, qwen2.5-coder:7b)"
     )
-    display_name = models.CharField(max_length=200, help_text="Human-readable model name")
+    display_name = models.CharField(
+        max_length=200,
+        db_index=True,
+        help_text="Human-readable model name"
+    )
     is_active = models.BooleanField(default=True)
     is_default = models.BooleanField(
         default=False,
         help_text="Use this as the default model for analysis"
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    objects = AIModelManager()
+
     class Meta:
         verbose_name = "AI Model"
         verbose_name_plural = "AI Models"
         unique_together = [['provider', 'model_id']]
         ordering = ['provider', 'model_id']
+        indexes = [
+            models.Index(fields=['provider', 'is_active', 'is_default'], name='aimodel_prov_active_idx'),
+            models.Index(
+                fields=['is_default'],
+                condition=models.Q(is_default=True),
+                name='aimodel_default_partial',
+            ),
+        ]
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Remember the loaded value so save() only clears other defaults
+        # when is_default actually transitions to True
+        self._original_is_default = self.is_default
+
     def __str__(self):
         return f"{self.display_name} ({self.provider.name})"
-    
+
     def save(self, *args, **kwargs):
-        # Ensure only one default model exists
-        if self.is_default:
-            AIModel.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
-        super().save(*args, **kwargs)
+        from django.db import transaction
+        # Ensure only one default model exists; skip the extra UPDATE when
+        # the flag is unset or unchanged since load. New rows always clear:
+        # their initial value never came from the database.
+        if self.is_default and (self.pk is None or not self._original_is_default):
+            with transaction.atomic():
+                AIModel.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._original_is_default = self.is_default
 
 
 class NotificationChannel(models.Model):
@@ -357,6 +459,13 @@ class NotificationChannel(models.Model):
         return f"{self.name} ({self.get_channel_type_display()})"
 
 
+class NotificationRuleManager(models.Manager):
+    """Manager that always joins the channel dereferenced by __str__"""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('channel')
+
+
 class NotificationRule(models.Model):
     """Defines when and how to send notifications"""
     TRIGGER_TYPES = [
@@ -374,11 +483,17 @@ class NotificationRule(models.Model):
     )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    objects = NotificationRuleManager()
+
     class Meta:
         verbose_name = "Notification Rule"
         verbose_name_plural = "Notification Rules"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['trigger_type', 'is_active'], name='rule_trigger_active_idx'),
+            models.Index(fields=['channel', 'is_active'], name='rule_chan_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} -> {self.channel.name}"
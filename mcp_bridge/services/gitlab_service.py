@@ -1,9 +1,18 @@
 """
 GitLab API Service for fetching repository contents
 """
+import base64
+import functools
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import gitlab
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Iterator, Optional, Dict, Any, Tuple
 from django.utils import timezone
 from datetime import timedelta
 from ..models import GitLabConnection, Repository
@@ -11,30 +20,104 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Process-wide registry of gitlab.Gitlab clients keyed by connection id
+# and a hash of the token they authenticate with. Each client owns a
+# requests.Session, so sharing one across GitLabService instances keeps
+# TCP/TLS connections alive between requests instead of handshaking on
+# every file fetch. A token refresh changes the key, which evicts the
+# stale client for that connection.
+_CLIENT_CACHE: Dict[Tuple[int, str], gitlab.Gitlab] = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+def _shared_client(instance_url: str, connection_id: int, token: str) -> gitlab.Gitlab:
+    """Get or build the pooled GitLab client for a connection/token pair"""
+    token_bytes = token.encode() if isinstance(token, str) else bytes(token)
+    key = (connection_id, hashlib.sha256(token_bytes).hexdigest())
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get(key)
+        if client is None:
+            # Drop clients built for the same connection under an old token
+            for stale in [k for k in _CLIENT_CACHE if k[0] == connection_id]:
+                del _CLIENT_CACHE[stale]
+            client = gitlab.Gitlab(instance_url, oauth_token=token)
+            adapter = HTTPAdapter(
+                pool_connections=20,
+                pool_maxsize=50,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.3,
+                    status_forcelist=[429, 502, 503, 504],
+                ),
+            )
+            client.session.mount('https://', adapter)
+            client.session.mount('http://', adapter)
+            _CLIENT_CACHE[key] = client
+    return client
+
+
+def _retry_on_auth_error(method):
+    """Refresh the token and retry a method once when GitLab returns 401
+
+    Covers the case where the stored expiry is missing or wrong: instead
+    of failing the tool call, drop the cached client, refresh, and give
+    the call one more chance with the new token.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            logger.info("GitLab rejected the token for %s; refreshing and retrying once", self.connection.name)
+            self._client = None
+            self._access_token = None
+            self._refresh_token()
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class GitLabService:
     """Service for interacting with GitLab API"""
-    
+
+    # Refresh this many seconds before the recorded expiry so a token
+    # that is about to lapse doesn't 401 mid-request
+    TOKEN_REFRESH_WINDOW = 60
+
     def __init__(self, connection: GitLabConnection):
         self.connection = connection
         self._client = None
-    
+        self._access_token = None
+        # Cache the expiry as an epoch float so the hot-path check is a
+        # single float compare instead of building an aware datetime
+        self._expires_ts = (
+            connection.token_expires_at.timestamp()
+            if connection.token_expires_at else float('inf')
+        )
+
     def _get_client(self) -> gitlab.Gitlab:
         """Get or create GitLab client with valid token"""
         if self._client is not None:
             return self._client
-        
-        # Check if token is expired and refresh if needed
-        if self.connection.token_expires_at and self.connection.token_expires_at <= timezone.now():
+
+        # Check if token is expired (or about to be) and refresh if
+        # needed; comparing cached epoch floats avoids constructing an
+        # aware datetime and touching any encrypted descriptor on the
+        # fast path
+        if time.time() >= self._expires_ts - self.TOKEN_REFRESH_WINDOW:
             self._refresh_token()
-        
-        access_token = self.connection.access_token
-        if not access_token:
+
+        if self._access_token is None:
+            # Decrypt the token once and keep the plaintext for the
+            # service's lifetime; re-reading the model attribute would
+            # Fernet-decrypt on every access
+            self._access_token = self.connection.access_token
+        if not self._access_token:
             raise ValueError(f"No access token available for connection: {self.connection.name}")
-        
-        self._client = gitlab.Gitlab(
+
+        self._client = _shared_client(
             self.connection.instance_url,
-            oauth_token=access_token
+            self.connection.pk,
+            self._access_token,
         )
         return self._client
     
@@ -60,6 +143,7 @@ class GitLabService:
             if response.status_code == 200:
                 token_response = response.json()
                 self.connection.access_token = token_response.get('access_token')
+                self._access_token = token_response.get('access_token')
                 if 'refresh_token' in token_response:
                     self.connection.refresh_token = token_response.get('refresh_token')
                 
@@ -67,15 +151,25 @@ class GitLabService:
                 expires_in = token_response.get('expires_in', 7200)
                 from datetime import timedelta
                 self.connection.token_expires_at = timezone.now() + timedelta(seconds=expires_in)
-                
-                self.connection.save()
+
+                # Only write the token columns; a bare save() would also
+                # re-encrypt client_secret even though it didn't change
+                self.connection.save(update_fields=[
+                    'access_token', 'refresh_token', 'token_expires_at', 'updated_at',
+                ])
+                self._expires_ts = self.connection.token_expires_at.timestamp()
                 logger.info(f"Token refreshed successfully for {self.connection.name}")
             else:
                 logger.error(f"Token refresh failed: {response.status_code} - {response.text}")
                 # Clear invalid tokens
                 self.connection.access_token = None
                 self.connection.refresh_token = None
-                self.connection.save()
+                self._access_token = None
+                # Don't retry the refresh on every call now that the
+                # tokens are gone; _get_client will raise on the missing
+                # access token instead
+                self._expires_ts = float('inf')
+                self.connection.save(update_fields=['access_token', 'refresh_token', 'updated_at'])
         except Exception as e:
             logger.error(f"Error refreshing token for {self.connection.name}: {e}")
     
@@ -96,15 +190,38 @@ class GitLabService:
         Returns:
             Dict with 'content', 'encoding', 'size', 'file_name'
         """
+        result = self.get_file_content_bytes(repository, file_path, ref)
+        result['content'] = result['content'].decode('utf-8', errors='replace')
+        return result
+
+    @_retry_on_auth_error
+    def get_file_content_bytes(
+        self,
+        repository: Repository,
+        file_path: str,
+        ref: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Fetch file content as raw bytes, deferring any UTF-8 decode
+
+        Same contract as get_file_content except 'content' is bytes.
+        Callers that only need a slice of the file (get_file_lines) can
+        select on the bytes and decode just the part they return.
+        """
         try:
             client = self._get_client()
-            project = client.projects.get(repository.gitlab_project_id)
-            
+            # lazy=True returns a project handle without the REST
+            # round-trip to /projects/{id}; the file fetch only needs the
+            # id to build its URL, so resolving the project first just
+            # doubled the request count per file
+            project = client.projects.get(repository.gitlab_project_id, lazy=True)
+
             ref = ref or repository.default_branch
             file = project.files.get(file_path=file_path, ref=ref)
-            
+
+            # Decode the base64 payload directly instead of going through
+            # file.decode(), which wraps the same call behind a method hop
             return {
-                'content': file.decode().decode('utf-8'),
+                'content': base64.b64decode(file.content),
                 'encoding': file.encoding,
                 'size': file.size,
                 'file_name': file.file_name,
@@ -139,35 +256,108 @@ class GitLabService:
         Returns:
             Dict with 'content', 'lines', 'file_path', 'ref'
         """
-        full_content = self.get_file_content(repository, file_path, ref)
-        lines = full_content['content'].split('\n')
-        
-        # Extract requested lines (1-indexed to 0-indexed)
-        requested_lines = lines[start_line - 1:end_line]
-        
+        full_content = self.get_file_content_bytes(repository, file_path, ref)
+        content = full_content['content']
+
+        # Walk newline offsets on the raw bytes instead of splitting the
+        # decoded text; only the requested slice ever gets UTF-8 decoded
+        start_idx = 0
+        for _ in range(start_line - 1):
+            nl = content.find(b'\n', start_idx)
+            if nl < 0:
+                start_idx = len(content)
+                break
+            start_idx = nl + 1
+
+        end_idx = start_idx
+        for _ in range(end_line - start_line + 1):
+            nl = content.find(b'\n', end_idx)
+            if nl < 0:
+                end_idx = len(content)
+                break
+            end_idx = nl + 1
+
+        requested = content[start_idx:end_idx].decode('utf-8', errors='replace')
+        if requested.endswith('\n'):
+            requested = requested[:-1]
+
         return {
-            'content': '\n'.join(requested_lines),
+            'content': requested,
             'lines': list(range(start_line, end_line + 1)),
             'file_path': file_path,
             'ref': ref or repository.default_branch,
-            'full_file_size': len(lines),
+            'full_file_size': content.count(b'\n') + 1,
         }
     
-    def list_repositories(self) -> list:
-        """List all accessible repositories for this connection"""
+    def get_files_content(
+        self,
+        repository: Repository,
+        file_paths,
+        ref: Optional[str] = None,
+        max_workers: int = 10
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fetch several files from a repository concurrently
+
+        Each fetch is an independent blocking HTTP round-trip, so fanning
+        them out over a small thread pool collapses N sequential
+        round-trips into roughly one; the shared client's pooled session
+        keeps connections alive across the worker threads. Files that
+        fail to fetch are logged and omitted from the result.
+
+        Args:
+            repository: Repository model instance
+            file_paths: Iterable of file paths (duplicates are fetched once)
+            ref: Git reference, defaults to repository.default_branch
+            max_workers: Upper bound on concurrent fetches
+
+        Returns:
+            Dict mapping file_path to its get_file_content result
+        """
+        results = {}
+        paths = list(dict.fromkeys(file_paths))
+        if not paths:
+            return results
+
+        # Resolve the client (and any pending token refresh) once up
+        # front instead of racing the refresh across worker threads
+        self._get_client()
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+            futures = {
+                executor.submit(self.get_file_content, repository, path, ref): path
+                for path in paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    logger.warning("Could not fetch %s from %s: %s", path, repository.gitlab_project_path, e)
+        return results
+
+    def list_repositories(self, per_page: int = 100) -> Iterator[Dict[str, Any]]:
+        """Iterate over all accessible repositories for this connection
+
+        Yields one dict per project, fetching pages lazily (per_page at a
+        time) instead of get_all=True materializing every project — and a
+        second list of dicts on top — before the caller sees the first one.
+        """
         try:
             client = self._get_client()
-            projects = client.projects.list(owned=True, get_all=True)
-            
-            return [
-                {
+            # simple=True asks the server for the reduced project
+            # representation, roughly halving the payload per page; it
+            # still carries the four fields yielded here, but fall back
+            # to 'main' defensively in case an older instance omits
+            # default_branch from the simple view
+            for project in client.projects.list(
+                owned=True, iterator=True, per_page=per_page, simple=True
+            ):
+                yield {
                     'id': project.id,
                     'path': project.path_with_namespace,
                     'name': project.name,
-                    'default_branch': project.default_branch,
+                    'default_branch': getattr(project, 'default_branch', 'main'),
                 }
-                for project in projects
-            ]
         except Exception as e:
             logger.error(f"Error listing repositories: {e}")
             raise
@@ -3,6 +3,7 @@ Log Analyzer Service for parsing error logs and extracting context
 """
 import re
 import os
+from bisect import bisect_right
 from typing import Dict, List, Optional, Tuple
 import logging
 
@@ -29,7 +30,20 @@ class LogAnalyzer:
         (r'([^\s:]+/[^\s:]+):(\d+)', 'generic'),
         (r'([^\s:]+\\[^\s:]+):(\d+)', 'generic'),
     ]
-    
+
+    # Compile once at class load; extract_errors used to re-compile every
+    # pattern for every line of the log
+    _COMPILED_PATTERNS = [
+        (re.compile(pattern, re.IGNORECASE), error_type)
+        for pattern, error_type in ERROR_PATTERNS
+    ]
+
+    # Single alternation for the keyword pass; IGNORECASE search matches
+    # the same lines the old per-keyword `in line.upper()` checks did
+    # without uppercasing every line five times
+    _KEYWORD_RE = re.compile(r'ERROR|EXCEPTION|FAILED|CRITICAL|FATAL', re.IGNORECASE)
+
+
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.content = None
@@ -43,7 +57,23 @@ class LogAnalyzer:
         with open(self.file_path, 'r', encoding='utf-8', errors='ignore') as f:
             self.content = f.read()
         return self.content
-    
+
+    def head(self, max_chars: int) -> str:
+        """Read up to max_chars from the start of the log file
+
+        Reads only the requested prefix from disk when the full content
+        hasn't been loaded yet, so callers that need a short snippet (e.g.
+        AI prompt context) never materialize a large log file in memory.
+        """
+        if self.content is not None:
+            return self.content[:max_chars]
+
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"Log file not found: {self.file_path}")
+
+        with open(self.file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read(max_chars)
+
     def extract_errors(self) -> List[Dict[str, any]]:
         """
         Extract error information from log file
@@ -55,64 +85,120 @@ class LogAnalyzer:
             self.read_log()
         
         errors = []
-        lines = self.content.split('\n')
-        
-        # Look for error patterns
-        for i, line in enumerate(lines):
-            for pattern, error_type in self.ERROR_PATTERNS:
-                matches = re.finditer(pattern, line, re.IGNORECASE)
-                for match in matches:
-                    error_info = {
-                        'type': error_type,
-                        'line_in_log': i + 1,
-                        'raw_line': line,
-                    }
-                    
-                    # Extract file path and line number if available
-                    if error_type == 'python' and len(match.groups()) >= 2:
-                        error_info['file_path'] = match.group(1)
-                        error_info['line_number'] = int(match.group(2))
-                    elif error_type == 'javascript' and len(match.groups()) >= 3:
-                        error_info['file_path'] = match.group(2)
-                        error_info['line_number'] = int(match.group(3))
-                    elif error_type == 'java' and len(match.groups()) >= 3:
-                        error_info['file_path'] = match.group(2)
-                        error_info['line_number'] = int(match.group(3))
-                    elif error_type == 'generic':
-                        # Generic patterns have different group structures
-                        # Pattern 1: ([^\s:]+\.(py|js|...)):(\d+): - groups: 1=file, 2=ext, 3=line
-                        # Pattern 2: ([^\s:]+\.(py|js|...))\((\d+)\) - groups: 1=file, 2=ext, 3=line
-                        # Pattern 3: ([^\s:]+/[^\s:]+):(\d+) - groups: 1=file, 2=line
-                        # Pattern 4: ([^\s:]+\\[^\s:]+):(\d+) - groups: 1=file, 2=line
-                        groups = match.groups()
-                        if len(groups) >= 3:
-                            # Pattern with file extension: group 1 is file, group 3 is line
-                            error_info['file_path'] = match.group(1)
-                            error_info['line_number'] = int(match.group(3))
-                        elif len(groups) >= 2:
-                            # Pattern without extension: group 1 is file, group 2 is line
-                            error_info['file_path'] = match.group(1)
-                            error_info['line_number'] = int(match.group(2))
-                    
-                    # Extract context (surrounding lines)
-                    context_start = max(0, i - 5)
-                    context_end = min(len(lines), i + 5)
-                    error_info['context'] = '\n'.join(lines[context_start:context_end])
-                    
-                    errors.append(error_info)
+        content = self.content
+
+        # Line-start offsets let a whole-buffer match position be mapped
+        # back to its line with one bisect, and raw lines / context
+        # windows are sliced straight out of the buffer — no split('\n')
+        # materializing a second full copy of the log as a line list.
+        line_starts = [0]
+        pos = content.find('\n')
+        while pos != -1:
+            line_starts.append(pos + 1)
+            pos = content.find('\n', pos + 1)
+        num_lines = len(line_starts)
+        # Sentinel one past a virtual trailing newline, so line k always
+        # spans content[line_starts[k]:line_starts[k + 1] - 1]
+        line_starts.append(len(content) + 1)
+
+        def line_slice(start_line, end_line):
+            """Lines [start_line, end_line) joined by newlines"""
+            return content[line_starts[start_line]:line_starts[end_line] - 1]
+
+        # Matches cluster (tracebacks hit several patterns over the same
+        # few lines), so identical context windows are sliced once and
+        # shared between records instead of re-copied per match
+        context_cache = {}
+
+        def context_slice(start_line, end_line):
+            """Memoized line_slice for context windows"""
+            key = (start_line, end_line)
+            ctx = context_cache.get(key)
+            if ctx is None:
+                ctx = context_cache[key] = line_slice(start_line, end_line)
+            return ctx
+
+        # Look for error patterns. Each compiled pattern sweeps the whole
+        # buffer once in C instead of being re-applied line by line from
+        # Python; none of the patterns can match across a newline, so the
+        # results are identical. Matches are collected and re-ordered to
+        # preserve the original line-major, pattern-priority output order.
+        hits = []
+        for pattern_idx, (pattern, error_type) in enumerate(self._COMPILED_PATTERNS):
+            for match in pattern.finditer(content):
+                line_idx = bisect_right(line_starts, match.start()) - 1
+                hits.append((line_idx, pattern_idx, match.start(), error_type, match))
+        hits.sort(key=lambda h: h[:3])
+
+        # ERROR_PATTERNS is ordered most-specific first (language
+        # patterns, then generic file:line shapes), and a single line —
+        # e.g. 'File "x.py", line 10' — often matches both a language
+        # pattern and a generic one, emitting duplicate records for the
+        # same reference. Keep only the highest-priority pattern's
+        # matches per line; the sort guarantees that's the first
+        # pattern_idx seen for each line.
+        best_pattern = {}
+        for line_idx, pattern_idx, _, _, _ in hits:
+            best_pattern.setdefault(line_idx, pattern_idx)
+        hits = [h for h in hits if h[1] == best_pattern[h[0]]]
+
+        for i, pattern_idx, _, error_type, match in hits:
+            error_info = {
+                'type': error_type,
+                'line_in_log': i + 1,
+                'raw_line': line_slice(i, i + 1),
+            }
+
+            # Extract file path and line number if available
+            if error_type == 'python' and len(match.groups()) >= 2:
+                error_info['file_path'] = match.group(1)
+                error_info['line_number'] = int(match.group(2))
+            elif error_type == 'javascript' and len(match.groups()) >= 3:
+                error_info['file_path'] = match.group(2)
+                error_info['line_number'] = int(match.group(3))
+            elif error_type == 'java' and len(match.groups()) >= 3:
+                error_info['file_path'] = match.group(2)
+                error_info['line_number'] = int(match.group(3))
+            elif error_type == 'generic':
+                # Generic patterns have different group structures
+                # Pattern 1: ([^\s:]+\.(py|js|...)):(\d+): - groups: 1=file, 2=ext, 3=line
+                # Pattern 2: ([^\s:]+\.(py|js|...))\((\d+)\) - groups: 1=file, 2=ext, 3=line
+                # Pattern 3: ([^\s:]+/[^\s:]+):(\d+) - groups: 1=file, 2=line
+                # Pattern 4: ([^\s:]+\\[^\s:]+):(\d+) - groups: 1=file, 2=line
+                groups = match.groups()
+                if len(groups) >= 3:
+                    # Pattern with file extension: group 1 is file, group 3 is line
+                    error_info['file_path'] = match.group(1)
+                    error_info['line_number'] = int(match.group(3))
+                elif len(groups) >= 2:
+                    # Pattern without extension: group 1 is file, group 2 is line
+                    error_info['file_path'] = match.group(1)
+                    error_info['line_number'] = int(match.group(2))
+
+            # Extract context (surrounding lines)
+            context_start = max(0, i - 5)
+            context_end = min(num_lines, i + 5)
+            error_info['context'] = context_slice(context_start, context_end)
+
+            errors.append(error_info)
         
-        # Also look for common error keywords
-        error_keywords = ['ERROR', 'EXCEPTION', 'FAILED', 'CRITICAL', 'FATAL']
-        for i, line in enumerate(lines):
-            if any(keyword in line.upper() for keyword in error_keywords):
-                # Check if we already captured this line
-                if not any(e['line_in_log'] == i + 1 for e in errors):
-                    errors.append({
-                        'type': 'generic',
-                        'line_in_log': i + 1,
-                        'raw_line': line,
-                        'context': '\n'.join(lines[max(0, i - 5):min(len(lines), i + 5)]),
-                    })
+        # Also look for common error keywords, sweeping the whole buffer
+        # with the alternation once; membership in a set of already-
+        # captured line numbers replaces the O(errors) scan the old
+        # duplicate check ran for every keyword line
+        captured_lines = {e['line_in_log'] for e in errors}
+        for match in self._KEYWORD_RE.finditer(content):
+            i = bisect_right(line_starts, match.start()) - 1
+            # Check if we already captured this line (or an earlier
+            # keyword hit on the same line)
+            if i + 1 not in captured_lines:
+                captured_lines.add(i + 1)
+                errors.append({
+                    'type': 'generic',
+                    'line_in_log': i + 1,
+                    'raw_line': line_slice(i, i + 1),
+                    'context': context_slice(max(0, i - 5), min(num_lines, i + 5)),
+                })
         
         self.errors = errors
         return errors
@@ -127,20 +213,17 @@ class LogAnalyzer:
         if not self.errors:
             self.extract_errors()
         
-        file_refs = []
+        # Dict keys dedupe in O(1) while keeping first-seen order; the old
+        # list membership check was O(refs) per error, quadratic on logs
+        # where a stack trace repeats the same few files
+        file_refs = {}
         for error in self.errors:
             if 'file_path' in error:
-                file_path = error['file_path']
-                line_number = error.get('line_number')
-                
                 # Normalize file path (remove leading/trailing whitespace)
-                file_path = file_path.strip()
-                
-                # Avoid duplicates
-                if (file_path, line_number) not in file_refs:
-                    file_refs.append((file_path, line_number))
-        
-        return file_refs
+                file_path = error['file_path'].strip()
+                file_refs.setdefault((file_path, error.get('line_number')))
+
+        return list(file_refs)
     
     def get_summary(self) -> Dict[str, any]:
         """Get a summary of errors found in the log"""
@@ -1,14 +1,174 @@
 """
 Notification Service for Slack and Microsoft Teams
 """
+import gzip
+import hashlib
+import re
 import requests
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Optional, Any
+from django.core.cache import cache
 from ..models import NotificationChannel, NotificationRule
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Shared pooled session for all webhook posts. Bare requests.post builds
+# a throwaway Session per call, so every notification paid a fresh TCP +
+# TLS handshake to the webhook host; reusing one session keeps those
+# connections alive across a notification burst and retries transient
+# webhook-side failures with backoff.
+_HTTP = requests.Session()
+# Set once on the session so every send inherits them through requests'
+# header merge instead of rebuilding a per-call dict
+_HTTP.headers.update({
+    'Accept': 'application/json',
+    'User-Agent': 'gitlab-mcp-bridge/1.0',
+})
+_HTTP.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST'],
+    ),
+))
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# How long a sent notification's idempotency key blocks resends; long
+# enough to swallow a log re-ingest, short enough that a genuinely
+# recurring error still gets reported
+_DEDUPE_TTL = 600
+
+class _TokenBucket:
+    """Thread-safe token bucket pacing sends to one webhook host
+
+    Refills at `rate` tokens per second up to `capacity`, so short
+    bursts pass immediately while sustained fan-out is smoothed to the
+    provider's pace instead of discovering the limit via 429 responses.
+    """
+
+    def __init__(self, rate=1.0, capacity=3):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait=5.0):
+        """Take one token, waiting up to max_wait seconds for a refill"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return True
+                wait = (1.0 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+# One bucket per webhook host: Slack documents roughly one message per
+# second per webhook, and Teams connectors are in the same ballpark
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def _acquire_send_slot(webhook_url):
+    """Pace a send against the per-host token bucket"""
+    host = urlparse(webhook_url).netloc
+    with _RATE_LIMITERS_LOCK:
+        bucket = _RATE_LIMITERS.get(host)
+        if bucket is None:
+            bucket = _RATE_LIMITERS[host] = _TokenBucket()
+    return bucket.acquire()
+
+
+# Strips stray backslashes escaping ?/&/= plus URL-encoded backslashes
+# (%5C) in one pass; equivalent to the four chained str.replace calls
+# this used to be, without rescanning the URL per pattern
+_URL_CLEAN_RE = re.compile(r'\\(?=[?&=])|%5C')
+
+# Webhook URLs whose Power Automate flow rejected the adaptive-card
+# format with a 400. A flow that can't parse the card never will, so
+# once a URL lands here every later send goes straight to the simple
+# payload instead of re-paying the doomed card POST (and its urllib3
+# retries) each time.
+_SIMPLE_PAYLOAD_URLS = set()
+
+if ORJSON_AVAILABLE:
+    def _encode_json(payload):
+        """Serialize a payload to JSON bytes with orjson
+
+        Adaptive cards with fact lists and long fix-suggestion strings
+        are non-trivial to encode; orjson serializes them several times
+        faster than the stdlib encoder requests uses for json=.
+        """
+        return orjson.dumps(payload)
+else:
+    def _encode_json(payload):
+        """Serialize a payload to JSON bytes via the stdlib encoder"""
+        return json.dumps(payload).encode('utf-8')
+
+
+# Bodies below this size cost more in gzip headers/CPU than they save on
+# the wire; cards with a fix suggestion attached usually clear it
+_GZIP_THRESHOLD = 1024
+
+_GZIP_HEADERS = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+
+# Hosts that answered a gzipped body with a 4xx; not every webhook
+# provider documents Content-Encoding support, so once a host balks it
+# gets plain bodies from then on instead of losing every send
+_GZIP_REJECTED_HOSTS = set()
+
+
+def _post_json(url, payload, timeout):
+    """POST a JSON payload, gzip-compressing larger bodies
+
+    Compression (compresslevel=1) shrinks the mostly-text cards
+    severalfold for little CPU, but it's applied optimistically: a 4xx
+    to a compressed body falls back to an uncompressed retry and marks
+    the host as not accepting gzip.
+    """
+    body = _encode_json(payload)
+    if len(body) > _GZIP_THRESHOLD:
+        host = urlparse(url).netloc
+        if host not in _GZIP_REJECTED_HOSTS:
+            response = _HTTP.post(
+                url,
+                data=gzip.compress(body, compresslevel=1),
+                headers=_GZIP_HEADERS,
+                timeout=timeout,
+            )
+            if not 400 <= response.status_code < 500:
+                return response
+            _GZIP_REJECTED_HOSTS.add(host)
+            logger.warning(
+                "Host %s rejected a gzipped body (%s); retrying uncompressed",
+                host, response.status_code,
+            )
+    return _HTTP.post(url, data=body, headers=_JSON_HEADERS, timeout=timeout)
+
 
 class NotificationService:
     """Service for sending notifications to Slack and Teams"""
@@ -73,16 +233,18 @@ class NotificationService:
                 }
             ]
             
-            # Add error details if available
+            # Add error details if available; collect the lines and join
+            # once instead of reallocating the string per +=
             if error_details:
-                error_text = f"*Error Type:* {error_details.get('type', 'Unknown')}\n"
+                detail_parts = [f"*Error Type:* {error_details.get('type', 'Unknown')}"]
                 if 'file_path' in error_details:
-                    error_text += f"*File:* `{error_details['file_path']}`\n"
+                    detail_parts.append(f"*File:* `{error_details['file_path']}`")
                 if 'line_number' in error_details:
-                    error_text += f"*Line:* {error_details['line_number']}\n"
+                    detail_parts.append(f"*Line:* {error_details['line_number']}")
                 if 'raw_line' in error_details:
-                    error_text += f"*Error:* `{error_details['raw_line'][:200]}`"
-                
+                    detail_parts.append(f"*Error:* `{error_details['raw_line'][:200]}`")
+                error_text = '\n'.join(detail_parts)
+
                 blocks.append({
                     "type": "section",
                     "text": {
@@ -104,8 +266,12 @@ class NotificationService:
             payload = {
                 "blocks": blocks
             }
-            
-            response = requests.post(webhook_url, json=payload, timeout=10)
+
+            if not _acquire_send_slot(webhook_url):
+                logger.warning(f"Rate limit exceeded for {self.channel.name}; dropping Slack notification")
+                return False
+
+            response = _post_json(webhook_url, payload, timeout=10)
             response.raise_for_status()
             
             logger.info(f"Slack notification sent successfully to {self.channel.name}")
@@ -160,8 +326,12 @@ class NotificationService:
                 })
             
             payload = card
-            
-            response = requests.post(webhook_url, json=payload, timeout=10)
+
+            if not _acquire_send_slot(webhook_url):
+                logger.warning(f"Rate limit exceeded for {self.channel.name}; dropping Teams notification")
+                return False
+
+            response = _post_json(webhook_url, payload, timeout=10)
             response.raise_for_status()
             
             logger.info(f"Teams notification sent successfully to {self.channel.name}")
@@ -182,7 +352,20 @@ class NotificationService:
         """Send notification based on a notification rule"""
         if not rule.is_active:
             return False
-        
+
+        # Idempotency guard: a re-ingested log or a double-fired trigger
+        # produces the exact same (channel, title, message, error line)
+        # tuple, and nothing else stops it from posting the same card
+        # twice. cache.add is atomic, so only the first sender within the
+        # window wins; duplicates report success without a POST.
+        key = hashlib.blake2b(_encode_json([
+            rule.channel_id, title, message,
+            (error_details or {}).get('raw_line'),
+        ])).hexdigest()
+        if not cache.add(f'notif:sent:{key}', 1, timeout=_DEDUPE_TTL):
+            logger.info(f"Skipping duplicate notification for rule {rule.name}")
+            return True
+
         service = NotificationService(rule.channel)
         return service.send_notification(title, message, error_details, fix_suggestion)
     
@@ -195,19 +378,43 @@ class NotificationService:
         fix_suggestion: Optional[str] = None
     ):
         """Trigger all active notifications for a given trigger type"""
-        rules = NotificationRule.objects.filter(
+        # The default manager already joins the channel; only() trims the
+        # row to the columns the senders actually read, which notably
+        # skips fetching channels' timestamps and rule created_at
+        # Filtering unsupported channel types in SQL drops their rows at
+        # the database instead of pulling them into Python just to have
+        # send_notification warn and return False
+        rules = list(NotificationRule.objects.filter(
             trigger_type=trigger_type,
-            is_active=True
-        )
-        
-        results = []
-        for rule in rules:
-            success = NotificationService.send_for_rule(
-                rule, title, message, error_details, fix_suggestion
+            is_active=True,
+            channel__channel_type__in=['slack', 'teams'],
+        ).only(
+            'name', 'is_active',
+            'channel__name', 'channel__channel_type', 'channel__webhook_url',
+        ))
+
+        if not rules:
+            return []
+
+        # Clamp the suggestion once to the largest per-channel limit
+        # (Teams' 2000 chars) so each concurrent send slices a small
+        # string instead of re-truncating a potentially huge LLM output,
+        # and the full-size string can be collected during the fan-out
+        if fix_suggestion:
+            fix_suggestion = fix_suggestion[:2000]
+
+        # Each send is an independent webhook POST, so fan them out over
+        # a small thread pool: M rules complete in roughly the slowest
+        # single send instead of the sum of all of them. map() preserves
+        # rule order in the results.
+        with ThreadPoolExecutor(max_workers=min(16, len(rules))) as executor:
+            successes = executor.map(
+                lambda rule: NotificationService.send_for_rule(
+                    rule, title, message, error_details, fix_suggestion
+                ),
+                rules,
             )
-            results.append((rule.name, success))
-        
-        return results
+            return [(rule.name, success) for rule, success in zip(rules, successes)]
     
     @staticmethod
     def send_to_power_automate(
@@ -231,11 +438,9 @@ class NotificationService:
             True if sent successfully, False otherwise
         """
         try:
-            # Clean up URL - remove escaped backslashes and decode URL-encoded backslashes
-            # Remove literal backslashes before special characters
-            webhook_url = webhook_url.replace('\\?', '?').replace('\\&', '&').replace('\\=', '=')
-            # Remove URL-encoded backslashes (%5C) - they shouldn't be in URLs
-            webhook_url = webhook_url.replace('%5C', '')
+            # Clean up URL - remove backslashes escaping special characters
+            # and URL-encoded backslashes (%5C); they shouldn't be in URLs
+            webhook_url = _URL_CLEAN_RE.sub('', webhook_url)
             
             # Format the error details
             error_type = error_analyzed.get('type', 'Unknown')
@@ -268,21 +473,11 @@ class NotificationService:
                 "",
             ]
             
-            # Add the suggestion (format code blocks nicely)
-            suggestion_lines = suggestion_text.split('\n')
-            formatted_suggestion = []
-            in_code_block = False
-            
-            for line in suggestion_lines:
-                if line.strip().startswith('```'):
-                    in_code_block = not in_code_block
-                    formatted_suggestion.append(line)
-                elif in_code_block:
-                    formatted_suggestion.append(line)
-                else:
-                    formatted_suggestion.append(line)
-            
-            message_parts.append('\n'.join(formatted_suggestion))
+            # The suggestion already carries its markdown code fences;
+            # the old line-by-line fence walk appended every line
+            # unchanged in all three branches, so it was a pure O(lines)
+            # no-op pass
+            message_parts.append(suggestion_text)
             message_parts.append("")
             message_parts.append(f"**Generated by:** {provider} ({model_used})")
             
@@ -357,48 +552,52 @@ class NotificationService:
                 ]
             }
             
-            # Power Automate webhook might expect the card in different formats
-            # Try sending as direct adaptive card first
-            payload = {
-                "type": "message",
-                "attachments": [
-                    {
-                        "contentType": "application/vnd.microsoft.card.adaptive",
-                        "content": adaptive_card
-                    }
-                ]
+            simple_payload = {
+                "title": title,
+                "repository": repository_name or 'N/A',
+                "error_type": error_type,
+                "file_path": file_path,
+                "line_number": str(line_number),
+                "raw_line": raw_line[:500],
+                "suggestion": suggestion_text[:4000],
+                "model": model_used,
+                "provider": provider,
+                "log_file": log_file_path or 'N/A'
             }
-            
-            # Send to Power Automate webhook
-            # Try adaptive card format first
-            try:
-                response = requests.post(webhook_url, json=payload, timeout=30)
-                response.raise_for_status()
-                logger.info(f"Power Automate notification sent successfully")
-                return True
-            except requests.exceptions.HTTPError as e:
-                # If adaptive card format fails, try sending just the data
-                # Power Automate flow can construct the card itself
-                if response.status_code == 400:
-                    logger.warning(f"Adaptive card format failed, trying simple data format: {e}")
-                    simple_payload = {
-                        "title": title,
-                        "repository": repository_name or 'N/A',
-                        "error_type": error_type,
-                        "file_path": file_path,
-                        "line_number": str(line_number),
-                        "raw_line": raw_line[:500],
-                        "suggestion": suggestion_text[:4000],
-                        "model": model_used,
-                        "provider": provider,
-                        "log_file": log_file_path or 'N/A'
-                    }
-                    response = requests.post(webhook_url, json=simple_payload, timeout=30)
+
+            # Flows known to reject the card skip straight to the simple
+            # format; everyone else tries the adaptive card first
+            if webhook_url not in _SIMPLE_PAYLOAD_URLS:
+                # Power Automate webhook might expect the card in different formats
+                # Try sending as direct adaptive card first
+                payload = {
+                    "type": "message",
+                    "attachments": [
+                        {
+                            "contentType": "application/vnd.microsoft.card.adaptive",
+                            "content": adaptive_card
+                        }
+                    ]
+                }
+                try:
+                    response = _post_json(webhook_url, payload, timeout=30)
                     response.raise_for_status()
-                    logger.info(f"Power Automate notification sent successfully (simple format)")
+                    logger.info(f"Power Automate notification sent successfully")
                     return True
-                else:
-                    raise
+                except requests.exceptions.HTTPError as e:
+                    # A 400 means the flow can't parse the card; remember
+                    # that and fall through to the simple data format.
+                    # Anything else (flow disabled, auth, 5xx) won't be
+                    # fixed by a different payload shape, so don't re-POST
+                    if response.status_code != 400:
+                        raise
+                    logger.warning(f"Adaptive card format failed, trying simple data format: {e}")
+                    _SIMPLE_PAYLOAD_URLS.add(webhook_url)
+
+            response = _post_json(webhook_url, simple_payload, timeout=30)
+            response.raise_for_status()
+            logger.info(f"Power Automate notification sent successfully (simple format)")
+            return True
             
         except Exception as e:
             logger.error(f"Error sending Power Automate notification: {e}")
@@ -1,11 +1,17 @@
 """
 Views for GitLab OAuth flow
 """
+import hashlib
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.shortcuts import redirect, render
 from django.contrib import messages
+from django.core.cache import cache
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
+from django.db import transaction
 from .models import GitLabConnection, Repository
 from .services.gitlab_service import GitLabService
 from django.utils import timezone
@@ -16,24 +22,172 @@ from urllib.parse import urlencode
 logger = logging.getLogger(__name__)
 
 
+# Shared pooled session for the OAuth token exchange; a bare
+# requests.post pays a fresh TCP + TLS handshake to the GitLab instance
+# on every callback. Connection-level retries cover transient network
+# blips; HTTP errors are not retried, since replaying a token POST with
+# an already-consumed code can't succeed anyway.
+_HTTP = requests.Session()
+_HTTP.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.2),
+))
+
+
+# How long the non-secret connection fields stay cached for the
+# OAuth-start path; model save()/delete() invalidate eagerly anyway
+_CONNECTION_TTL = 300
+
+
+def _connection_lite(connection_id):
+    """Non-secret fields of an active connection, cached briefly
+
+    gitlab_oauth_start only reads instance_url and client_id, so serving
+    them from the cache skips both the query and any row decryption.
+    Secrets are deliberately left out; paths that need them still load
+    the row. Raises GitLabConnection.DoesNotExist like a plain .get().
+    """
+    key = f'gitlab:conn:{connection_id}'
+    info = cache.get(key)
+    if info is None:
+        connection = GitLabConnection.objects.only(
+            'id', 'instance_url', 'client_id', 'is_active', 'updated_at',
+        ).get(id=connection_id, is_active=True)
+        info = {
+            'id': connection.pk,
+            'instance_url': connection.instance_url,
+            'client_id': connection.client_id,
+            'updated_at': connection.updated_at,
+        }
+        cache.set(key, info, _CONNECTION_TTL)
+    return info
+
+
+# How long a fetched repository listing stays valid; back-to-back admin
+# syncs within this window reuse it instead of re-paging /projects
+_REPO_LIST_TTL = 60
+
+
+def _repo_listing(connection, gitlab_service, force_refresh=False):
+    """Get the connection's repository listing, cached for a short TTL
+
+    Repeated clicks on the sync button re-walked every page of the
+    project listing even when nothing changed upstream. The materialized
+    list is kept in the cache for a minute; a fresh OAuth connect always
+    refetches (and re-seeds the cache) since the new token may see a
+    different set of projects.
+    """
+    cache_key = f'gitlab:repos:{connection.pk}'
+    if not force_refresh:
+        repos = cache.get(cache_key)
+        if repos is not None:
+            return repos
+    repos = list(gitlab_service.list_repositories())
+    cache.set(cache_key, repos, _REPO_LIST_TTL)
+    return repos
+
+
+def _sync_repositories(connection, repo_infos):
+    """Mirror the connection's GitLab projects into Repository rows
+
+    The old per-repo update_or_create issued a SELECT plus an INSERT or
+    UPDATE for every project — O(N) database round trips per sync.
+    Loading the existing rows once and writing changes back with
+    bulk_create/bulk_update keeps it at three queries regardless of how
+    many projects the connection owns.
+
+    Returns:
+        Tuple (created_count, updated_count)
+    """
+    # Fingerprint the listing so a repeat sync with an identical upstream
+    # state (the common case: user clicks sync twice, or reconnects
+    # without any project changes) skips the row load and writes
+    # entirely. Hashing the full dicts, not just the ids, means renames
+    # and default-branch changes still get through.
+    repo_infos = list(repo_infos)
+    digest = hashlib.blake2b(
+        json.dumps(repo_infos, sort_keys=True).encode()
+    ).hexdigest()
+    digest_key = f'gitlab:repos:digest:{connection.pk}'
+    if cache.get(digest_key) == digest:
+        return 0, 0
+
+    existing = {
+        repo.gitlab_project_id: repo
+        for repo in Repository.objects.filter(gitlab_connection=connection)
+    }
+
+    to_create = []
+    to_update = []
+    now = timezone.now()
+    for repo_info in repo_infos:
+        repo = existing.get(repo_info['id'])
+        if repo is None:
+            to_create.append(Repository(
+                gitlab_connection=connection,
+                gitlab_project_id=repo_info['id'],
+                local_name=repo_info['path'].replace('/', '_'),
+                gitlab_project_path=repo_info['path'],
+                default_branch=repo_info.get('default_branch', 'main'),
+                is_active=True,
+            ))
+        else:
+            repo.local_name = repo_info['path'].replace('/', '_')
+            repo.gitlab_project_path = repo_info['path']
+            repo.default_branch = repo_info.get('default_branch', 'main')
+            repo.is_active = True
+            # bulk_update bypasses save(), so auto_now needs a hand
+            repo.updated_at = now
+            to_update.append(repo)
+
+    # One commit for the whole sync instead of autocommit per statement;
+    # a partially-applied sync is also never visible to readers
+    with transaction.atomic():
+        if to_create:
+            Repository.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            Repository.objects.bulk_update(
+                to_update,
+                ['local_name', 'gitlab_project_path', 'default_branch', 'is_active', 'updated_at'],
+                batch_size=500,
+            )
+    cache.set(digest_key, digest, 3600)
+    return len(to_create), len(to_update)
+
+
 @require_http_methods(["GET"])
 def gitlab_oauth_start(request, connection_id):
     """Initiate GitLab OAuth flow"""
     try:
-        connection = GitLabConnection.objects.get(id=connection_id, is_active=True)
-        
-        # Build OAuth authorization URL
-        redirect_uri = request.build_absolute_uri(f'/mcp/gitlab/oauth/callback/{connection_id}/')
-        
-        # Properly encode query parameters
-        params = {
-            'client_id': connection.client_id,
-            'redirect_uri': redirect_uri,
-            'response_type': 'code',
-            'scope': 'api read_user'  # GitLab expects space-separated scopes
-        }
-        auth_url = f"{connection.instance_url}/oauth/authorize?{urlencode(params)}"
-        
+        # The cached non-secret fields are all this view reads, so the
+        # hot path touches neither the database nor Fernet
+        connection = _connection_lite(connection_id)
+
+        # The URI and auth URL only depend on the host and the
+        # connection's config, so build them once per host and reuse;
+        # updated_at in the key invalidates on any connection edit
+        cache_key = (
+            f"oauth:authurl:{request.get_host()}:{connection['id']}:"
+            f"{connection['updated_at'].timestamp()}"
+        )
+        cached = cache.get(cache_key)
+        if cached is None:
+            # Build OAuth authorization URL
+            redirect_uri = request.build_absolute_uri(f'/mcp/gitlab/oauth/callback/{connection_id}/')
+
+            # Properly encode query parameters
+            params = {
+                'client_id': connection['client_id'],
+                'redirect_uri': redirect_uri,
+                'response_type': 'code',
+                'scope': 'api read_user'  # GitLab expects space-separated scopes
+            }
+            auth_url = f"{connection['instance_url']}/oauth/authorize?{urlencode(params)}"
+            cache.set(cache_key, (redirect_uri, auth_url), 3600)
+        else:
+            redirect_uri, auth_url = cached
+
         # Store redirect URI in session for callback
         request.session['gitlab_redirect_uri'] = redirect_uri
         
@@ -90,27 +244,46 @@ def gitlab_oauth_callback(request, connection_id):
             'redirect_uri': redirect_uri,
         }
         
-        logger.info(f"Exchanging token for connection {connection_id}")
-        logger.debug(f"Token URL: {token_url}")
-        logger.debug(f"Redirect URI: {redirect_uri}")
-        logger.debug(f"Client ID: {connection.client_id}")
-        logger.debug(f"Client Secret present: {bool(client_secret)}")
-        logger.debug(f"Client Secret length: {len(client_secret) if client_secret else 0}")
-        
-        response = requests.post(token_url, data=token_data, timeout=10)
-        
-        if response.status_code != 200:
+        # Authorization codes are single-use, so a browser double-submit
+        # or refresh of the callback would re-hit /oauth/token only to be
+        # rejected for code reuse. Remember the successful exchange for a
+        # minute keyed by the code's hash and replay it instead.
+        token_cache_key = (
+            f'oauth:token:{connection_id}:{hashlib.sha256(code.encode()).hexdigest()}'
+        )
+        cached_token_response = cache.get(token_cache_key)
+        if cached_token_response is not None:
+            logger.info("Reusing cached token exchange for connection %s", connection_id)
+            parsed = cached_token_response
+            response = None
+        else:
+            logger.info("Exchanging token for connection %s", connection_id)
+            # %s-deferred args only format when DEBUG is enabled
+            logger.debug("Token URL: %s", token_url)
+            logger.debug("Redirect URI: %s", redirect_uri)
+            logger.debug("Client ID: %s", connection.client_id)
+            logger.debug("Client Secret present: %s", bool(client_secret))
+            logger.debug("Client Secret length: %s", len(client_secret) if client_secret else 0)
+
+            response = _HTTP.post(token_url, data=token_data, timeout=10)
+
+            # Parse the body once and reuse it in whichever branch runs
             try:
-                error_detail = response.json()
-                error_message = error_detail.get('error_description', error_detail.get('error', response.text))
-            except:
+                parsed = response.json()
+            except Exception:
+                parsed = None
+
+        if response is not None and response.status_code != 200:
+            if parsed is not None:
+                error_message = parsed.get('error_description', parsed.get('error', response.text))
+            else:
                 error_message = response.text
             
-            logger.error(f"Token exchange failed: {response.status_code}")
-            logger.error(f"Error details: {error_message}")
-            logger.error(f"Request details - Redirect URI: {redirect_uri}")
-            logger.error(f"Request details - Client ID: {connection.client_id}")
-            logger.error(f"Request details - Code: {code[:20]}...")
+            logger.error("Token exchange failed: %s", response.status_code)
+            logger.error("Error details: %s", error_message)
+            logger.error("Request details - Redirect URI: %s", redirect_uri)
+            logger.error("Request details - Client ID: %s", connection.client_id)
+            logger.error("Request details - Code: %s...", code[:20])
             
             messages.error(
                 request,
@@ -121,11 +294,21 @@ def gitlab_oauth_callback(request, connection_id):
                 f"3) Authorization code hasn't expired (try clicking 'Connect to GitLab' again)."
             )
             return redirect('admin:mcp_bridge_gitlabconnection_change', connection_id)
-        
-        response.raise_for_status()
-        
-        token_response = response.json()
-        
+
+        if parsed is None:
+            # A 200 whose body isn't JSON carries no tokens; failing the
+            # exchange beats saving a null access token and caching an
+            # empty response for replay
+            logger.error("Token endpoint returned 200 with an unparseable body")
+            messages.error(
+                request,
+                "OAuth token exchange returned an invalid response. Please try again."
+            )
+            return redirect('admin:mcp_bridge_gitlabconnection_change', connection_id)
+
+        token_response = parsed
+        cache.set(token_cache_key, token_response, 60)
+
         # Save tokens
         connection.access_token = token_response.get('access_token')
         connection.refresh_token = token_response.get('refresh_token')
@@ -133,33 +316,26 @@ def gitlab_oauth_callback(request, connection_id):
         # Calculate expiration (GitLab tokens typically expire in 2 hours)
         expires_in = token_response.get('expires_in', 7200)
         connection.token_expires_at = timezone.now() + timedelta(seconds=expires_in)
-        
-        connection.save()
+
+        # Only the token columns changed; writing everything would
+        # re-encrypt client_secret for no reason
+        connection.save(update_fields=[
+            'access_token', 'refresh_token', 'token_expires_at', 'updated_at',
+        ])
         
         # Sync repositories
         try:
             gitlab_service = GitLabService(connection)
-            repos = gitlab_service.list_repositories()
-            
-            # Create or update repository mappings
-            for repo_info in repos:
-                Repository.objects.update_or_create(
-                    gitlab_connection=connection,
-                    gitlab_project_id=repo_info['id'],
-                    defaults={
-                        'local_name': repo_info['path'].replace('/', '_'),
-                        'gitlab_project_path': repo_info['path'],
-                        'default_branch': repo_info.get('default_branch', 'main'),
-                        'is_active': True,
-                    }
-                )
-            
+
+            repos = _repo_listing(connection, gitlab_service, force_refresh=True)
+            created_count, updated_count = _sync_repositories(connection, repos)
+
             messages.success(
                 request,
-                f"Successfully connected! Synced {len(repos)} repositories."
+                f"Successfully connected! Synced {created_count + updated_count} repositories."
             )
         except Exception as e:
-            logger.error(f"Error syncing repositories: {e}")
+            logger.error("Error syncing repositories: %s", e)
             messages.warning(
                 request,
                 "Connected but failed to sync repositories. You can add them manually."
@@ -171,7 +347,7 @@ def gitlab_oauth_callback(request, connection_id):
         messages.error(request, "GitLab connection not found")
         return redirect('admin:mcp_bridge_gitlabconnection_changelist')
     except Exception as e:
-        logger.error(f"OAuth callback error: {e}", exc_info=True)
+        logger.error("OAuth callback error: %s", e, exc_info=True)
         messages.error(request, f"OAuth error: {str(e)}")
         return redirect('admin:mcp_bridge_gitlabconnection_changelist')
 
@@ -180,44 +356,29 @@ def gitlab_oauth_callback(request, connection_id):
 def gitlab_sync_repos(request, connection_id):
     """Manually sync repositories for a connection"""
     try:
-        connection = GitLabConnection.objects.get(id=connection_id, is_active=True)
+        # client_secret (and refresh_token, unless a refresh actually
+        # fires and lazy-loads it) stays encrypted in the database
+        connection = GitLabConnection.objects.only(
+            'id', 'name', 'instance_url', 'access_token', 'token_expires_at', 'is_active',
+        ).get(id=connection_id, is_active=True)
         
         if not connection.access_token:
             messages.error(request, "No access token. Please connect via OAuth first.")
             return redirect('admin:mcp_bridge_gitlabconnection_change', connection_id)
         
         gitlab_service = GitLabService(connection)
-        repos = gitlab_service.list_repositories()
-        
-        # Create or update repository mappings
-        created_count = 0
-        updated_count = 0
-        
-        for repo_info in repos:
-            repo, created = Repository.objects.update_or_create(
-                gitlab_connection=connection,
-                gitlab_project_id=repo_info['id'],
-                defaults={
-                    'local_name': repo_info['path'].replace('/', '_'),
-                    'gitlab_project_path': repo_info['path'],
-                    'default_branch': repo_info.get('default_branch', 'main'),
-                    'is_active': True,
-                }
-            )
-            
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
-        
+
+        repos = _repo_listing(connection, gitlab_service)
+        created_count, updated_count = _sync_repositories(connection, repos)
+
         messages.success(
             request,
-            f"Synced {len(repos)} repositories ({created_count} new, {updated_count} updated)."
+            f"Synced {created_count + updated_count} repositories ({created_count} new, {updated_count} updated)."
         )
         
         return redirect('admin:mcp_bridge_repository_changelist')
     
     except Exception as e:
-        logger.error(f"Error syncing repositories: {e}", exc_info=True)
+        logger.error("Error syncing repositories: %s", e, exc_info=True)
         messages.error(request, f"Error syncing repositories: {str(e)}")
         return redirect('admin:mcp_bridge_gitlabconnection_change', connection_id)
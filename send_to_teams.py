@@ -7,6 +7,7 @@ Usage:
     echo '{"error_analyzed": {...}, "fix_suggestion": {...}}' | python send_to_teams.py <webhook_url>
 """
 import json
+import re
 import sys
 import requests
 import os
@@ -21,6 +22,50 @@ django.setup()
 
 from mcp_bridge.services.notification_service import NotificationService
 
+# Strips shell-escape backslashes before ?/&/= and URL-encoded
+# backslashes (%5C) in one pass; same pattern the notification service
+# uses on webhook URLs
+_URL_CLEAN_RE = re.compile(r'\\(?=[?&=])|%5C')
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _loads(data):
+    """Parse JSON from bytes or str, with orjson when installed
+
+    orjson takes bytes directly, so reading the payload in binary mode
+    skips a Python-level UTF-8 decode of multi-MB MCP outputs entirely.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# First line opening with { or [ — where the JSON starts when warnings
+# precede it. Anchored to line starts so a bracket inside a preamble
+# line (e.g. "Warning: option [deprecated]") doesn't trip the scan.
+_JSON_START_RE = re.compile(rb'(?m)^[ \t]*[\[{]')
+
+
+def _parse_json_after_preamble(raw: bytes):
+    """Parse JSON that may be preceded by non-JSON output (warnings etc.)
+
+    Slices from the first line opening with '{' or '[' and parses once,
+    falling back to parsing the whole payload. Raises ValueError if
+    neither works.
+    """
+    match = _JSON_START_RE.search(raw)
+    if match:
+        try:
+            return _loads(raw[match.start():])
+        except ValueError:
+            pass
+    return _loads(raw)
+
 
 def format_and_send(webhook_url: str, data: dict, repository_name: str = None, log_file_path: str = None):
     """Format and send notification to Teams"""
@@ -54,11 +99,9 @@ def main():
         sys.exit(1)
     
     webhook_url = sys.argv[1]
-    # Clean up URL - remove escaped backslashes that might come from shell escaping
-    # Remove literal backslashes before special characters
-    webhook_url = webhook_url.replace('\\?', '?').replace('\\&', '&').replace('\\=', '=')
-    # Remove URL-encoded backslashes (%5C) - they shouldn't be in URLs
-    webhook_url = webhook_url.replace('%5C', '')
+    # Clean up URL - remove escaped backslashes that might come from
+    # shell escaping, and URL-encoded backslashes (%5C)
+    webhook_url = _URL_CLEAN_RE.sub('', webhook_url)
     
     # Read JSON from file or stdin
     # Check if stdin is available (piped input) or if file argument is empty
@@ -69,76 +112,33 @@ def main():
         # Read from file
         json_file = sys.argv[2]
         try:
-            with open(json_file, 'r') as f:
+            with open(json_file, 'rb') as f:
                 file_content = f.read()
         except FileNotFoundError:
             print(f"Error: File not found: {json_file}")
             sys.exit(1)
-        
-        # Try to find JSON in the file (might have warnings before JSON)
-        # Look for the first line that starts with { or [
-        lines = file_content.split('\n')
-        json_start = None
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line.startswith('{') or line.startswith('['):
-                json_start = i
-                break
-        
-        if json_start is not None:
-            # Try to parse from the JSON start
-            json_content = '\n'.join(lines[json_start:])
-            try:
-                data = json.loads(json_content)
-            except json.JSONDecodeError:
-                # If that fails, try parsing the whole file
-                try:
-                    data = json.loads(file_content)
-                except json.JSONDecodeError as e:
-                    print(f"Error: Invalid JSON in file: {e}")
-                    print(f"First 200 chars: {file_content[:200]}")
-                    sys.exit(1)
-        else:
-            # No JSON found, try parsing whole file
-            try:
-                data = json.loads(file_content)
-            except json.JSONDecodeError as e:
-                print(f"Error: No valid JSON found in file: {e}")
-                print(f"First 200 chars: {file_content[:200]}")
-                sys.exit(1)
+
+        # The file might have warnings before the JSON; skip the
+        # preamble with a single scan instead of splitting into lines
+        try:
+            data = _parse_json_after_preamble(file_content)
+        except ValueError as e:
+            print(f"Error: Invalid JSON in file: {e}")
+            print(f"First 200 chars: {file_content[:200].decode('utf-8', errors='replace')}")
+            sys.exit(1)
     else:
-        # Read from stdin (piped input)
-        input_data = sys.stdin.read()
+        # Read from stdin (piped input) as raw bytes
+        input_data = sys.stdin.buffer.read()
         if not input_data.strip():
             print("Error: No JSON data provided via stdin")
             sys.exit(1)
-        
-        # Try to find JSON in the input (might have warnings before JSON)
-        lines = input_data.split('\n')
-        json_start = None
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line.startswith('{') or line.startswith('['):
-                json_start = i
-                break
-        
-        if json_start is not None:
-            json_content = '\n'.join(lines[json_start:])
-            try:
-                data = json.loads(json_content)
-            except json.JSONDecodeError:
-                # If that fails, try parsing the whole input
-                try:
-                    data = json.loads(input_data)
-                except json.JSONDecodeError as e:
-                    print(f"Error: Invalid JSON in input: {e}")
-                    sys.exit(1)
-        else:
-            try:
-                data = json.loads(input_data)
-            except json.JSONDecodeError as e:
-                print(f"Error: Invalid JSON in input: {e}")
-                sys.exit(1)
+
+        # Same preamble handling as the file branch
+        try:
+            data = _parse_json_after_preamble(input_data)
+        except ValueError as e:
+            print(f"Error: Invalid JSON in input: {e}")
+            sys.exit(1)
     
     # Extract repository name and log file path if provided
     # Skip empty arguments
@@ -155,8 +155,8 @@ def main():
                 content = content_list[0].get('text', '')
                 if content:
                     try:
-                        data = json.loads(content)
-                    except json.JSONDecodeError as e:
+                        data = _loads(content)
+                    except ValueError as e:
                         print(f"Error: Failed to parse JSON from MCP response text field: {e}")
                         print(f"Content preview: {content[:200]}")
                         sys.exit(1)